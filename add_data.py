@@ -11,13 +11,102 @@ import json
 import uuid
 from datetime import datetime, timedelta
 from neo4j import GraphDatabase
+from neo4j.exceptions import ClientError
 import random
 import sys
+from collections import defaultdict
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 load_dotenv()
 
+# Số dòng tối đa gửi trong một lần UNWIND
+BATCH_SIZE = 10000
+
+# Mã lỗi khi constraint/index đã tồn tại
+SCHEMA_EXISTS_CODES = {
+    "Neo.ClientError.Schema.EquivalentSchemaRuleAlreadyExists",
+    "Neo.ClientError.Schema.ConstraintAlreadyExists",
+    "Neo.ClientError.Schema.IndexAlreadyExists",
+}
+
+# Tạo một Answer cùng hai relationship từ row r (dùng chung cho APOC và cách ghi phía client)
+ANSWER_WRITE_CYPHER = """
+MATCH (u:User {id: r.user_id})
+MATCH (q:Question {id: r.question_id})
+CREATE (u)-[:ANSWERED]->(a:Answer {
+    id: r.id,
+    student_answer: r.student_answer,
+    is_correct: r.is_correct,
+    start_time: r.start_time,
+    completion_time: r.completion_time,
+    duration_seconds: r.duration_seconds,
+    createdAt: r.createdAt,
+    updatedAt: r.updatedAt
+})-[:ANSWERS_QUESTION]->(q)
+"""
+
+CORRECT_ANSWER_TEXT = "Câu trả lời đúng của học sinh"
+WRONG_ANSWER_TEXT = "Câu trả lời sai của học sinh"
+
+def _bulk_uuids(n):
+    """Sinh n UUID v4 dạng chuỗi từ một lần gọi os.urandom"""
+    buf = os.urandom(16 * n)
+    return [str(uuid.UUID(bytes=buf[i * 16:(i + 1) * 16], version=4)) for i in range(n)]
+
 class Neo4jEducationImporter:
+    # Các query mẫu để khám phá dữ liệu sau khi import
+    SAMPLE_QUERIES = {
+        "Xem tất cả users": "MATCH (u:User) RETURN u",
+        "Xem progress của từng học sinh": """
+            MATCH (u:User)-[:ANSWERED]->(a:Answer)-[:ANSWERS_QUESTION]->(q:Question)
+            RETURN u.name as student_name, 
+                   count(q) as total_questions, 
+                   count(CASE WHEN a.is_correct = true THEN 1 END) as correct_answers,
+                   round(100.0 * count(CASE WHEN a.is_correct = true THEN 1 END) / count(q), 2) as accuracy_percentage
+            ORDER BY accuracy_percentage DESC
+        """,
+        "Xem câu hỏi khó nhất": """
+            MATCH (q:Question)<-[:ANSWERS_QUESTION]-(a:Answer)
+            RETURN q.title, q.difficulty, q.page,
+                   count(a) as total_attempts,
+                   count(CASE WHEN a.is_correct = true THEN 1 END) as correct_attempts,
+                   round(100.0 * count(CASE WHEN a.is_correct = true THEN 1 END) / count(a), 2) as success_rate
+            ORDER BY success_rate ASC
+            LIMIT 10
+        """,
+        "Xem thời gian làm bài trung bình": """
+            MATCH (u:User)-[:ANSWERED]->(a:Answer)
+            RETURN u.name as student_name, 
+                   round(avg(a.duration_seconds), 0) as avg_duration_seconds,
+                   round(avg(a.duration_seconds)/60.0, 1) as avg_duration_minutes
+            ORDER BY avg_duration_seconds
+        """,
+        "Xem cấu trúc dữ liệu đầy đủ": """
+            MATCH path = (u:User)-[:ANSWERED]->(a:Answer)-[:ANSWERS_QUESTION]->(q:Question)
+                        -[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
+                        -[:BELONGS_TO_TYPE_BOOK]->(tb:TypeBook)-[:BELONGS_TO_SUBJECT]->(s:Subject)
+                        -[:BELONGS_TO_GRADE]->(g:Grade)
+            RETURN u.name as student, c.name as chapter, l.name as lesson, 
+                   q.title as question, a.is_correct as correct, a.duration_seconds as duration
+            LIMIT 10
+        """,
+        "Thống kê theo chapter": """
+            MATCH (c:Chapter)<-[:BELONGS_TO_LESSON]-(l:Lesson)<-[:BELONGS_TO_QUESTION]-(q:Question)
+                  <-[:ANSWERS_QUESTION]-(a:Answer)
+            RETURN c.name as chapter_name,
+                   count(DISTINCT q) as total_questions,
+                   count(a) as total_attempts,
+                   count(CASE WHEN a.is_correct = true THEN 1 END) as correct_attempts,
+                   round(100.0 * count(CASE WHEN a.is_correct = true THEN 1 END) / count(a), 2) as success_rate
+            ORDER BY success_rate DESC
+        """
+    }
+
     def __init__(self, json_file_path="toan-lop1-canh-dieu.json"):
         """
         Initialize the importer
@@ -38,8 +127,13 @@ class Neo4jEducationImporter:
     def load_json_data(self):
         """Load dữ liệu từ file JSON"""
         try:
-            with open(self.json_file_path, 'r', encoding='utf-8') as f:
-                self.math_data = json.load(f)
+            if orjson is not None:
+                # orjson.JSONDecodeError kế thừa json.JSONDecodeError nên except bên dưới vẫn bắt được
+                with open(self.json_file_path, 'rb') as f:
+                    self.math_data = orjson.loads(f.read())
+            else:
+                with open(self.json_file_path, 'r', encoding='utf-8') as f:
+                    self.math_data = json.load(f)
             print(f"✅ Đã load {len(self.math_data)} câu hỏi từ file {self.json_file_path}")
         except FileNotFoundError:
             print(f"❌ Không tìm thấy file {self.json_file_path}")
@@ -75,17 +169,16 @@ class Neo4jEducationImporter:
             self.driver.close()
             print("🔒 Đã đóng kết nối Neo4j")
 
-    def clear_database(self):
+    def clear_database(self, session):
         """Xóa toàn bộ dữ liệu trong database"""
         try:
-            with self.driver.session() as session:
-                session.run("MATCH (n) DETACH DELETE n")
+            session.run("MATCH (n) DETACH DELETE n").consume()
             print("🗑️ Đã xóa toàn bộ dữ liệu trong database")
         except Exception as e:
             print(f"❌ Lỗi xóa database: {e}")
             raise
 
-    def create_constraints_and_indexes(self):
+    def create_constraints_and_indexes(self, session):
         """Tạo constraints và indexes"""
         constraints_queries = [
             "CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE",
@@ -98,57 +191,83 @@ class Neo4jEducationImporter:
             "CREATE CONSTRAINT answer_id_unique IF NOT EXISTS FOR (a:Answer) REQUIRE a.id IS UNIQUE"
         ]
         
-        with self.driver.session() as session:
+        def _create_all(tx):
+            for query in constraints_queries:
+                tx.run(query).consume()
+        
+        try:
+            # Gửi toàn bộ DDL trong một transaction
+            session.execute_write(_create_all)
+        except ClientError as e:
+            # Chỉ bỏ qua lỗi constraint/index đã tồn tại
+            if e.code not in SCHEMA_EXISTS_CODES:
+                print(f"❌ Lỗi tạo constraint: {e}")
+                raise
+            # Lỗi này rollback cả transaction nên tạo lại từng constraint
             for query in constraints_queries:
                 try:
-                    session.run(query)
-                except Exception as e:
-                    # Constraint có thể đã tồn tại
-                    pass
+                    session.run(query).consume()
+                except ClientError as e:
+                    if e.code not in SCHEMA_EXISTS_CODES:
+                        print(f"❌ Lỗi tạo constraint: {e}")
+                        raise
+        
+        # Đợi index sẵn sàng trước khi các query UNWIND MATCH theo id chạy
+        session.run("CALL db.awaitIndexes()").consume()
         
         print("📋 Đã tạo constraints và indexes")
 
+    def _run_unwind(self, session, query, rows, **params):
+        """Chạy query UNWIND $rows theo từng lô BATCH_SIZE dòng, mỗi lô một transaction"""
+        def _write(tx, chunk):
+            tx.run(query, rows=chunk, **params).consume()
+        
+        for start in range(0, len(rows), BATCH_SIZE):
+            session.execute_write(_write, rows[start:start + BATCH_SIZE])
+
     def generate_timestamp(self, days_ago=0, hours_ago=0, minutes_ago=0):
         """Tạo timestamp với offset"""
         base_time = datetime.now() - timedelta(days=days_ago, hours=hours_ago, minutes=minutes_ago)
         return base_time.isoformat()
 
-    def create_users(self):
+    def create_users(self, session):
         """Tạo dữ liệu Users - học sinh"""
         users_data = [
-            {"id": str(uuid.uuid4()), "name": "Nguyễn Văn An", "email": "an.nguyen@student.com", "age": 7},
-            {"id": str(uuid.uuid4()), "name": "Trần Thị Bình", "email": "binh.tran@student.com", "age": 6},
-            {"id": str(uuid.uuid4()), "name": "Lê Văn Cường", "email": "cuong.le@student.com", "age": 7},
-            {"id": str(uuid.uuid4()), "name": "Phạm Thị Dung", "email": "dung.pham@student.com", "age": 6},
-            {"id": str(uuid.uuid4()), "name": "Hoàng Văn Em", "email": "em.hoang@student.com", "age": 7},
-            {"id": str(uuid.uuid4()), "name": "Vũ Thị Hoa", "email": "hoa.vu@student.com", "age": 6},
-            {"id": str(uuid.uuid4()), "name": "Đặng Văn Khoa", "email": "khoa.dang@student.com", "age": 7},
-            {"id": str(uuid.uuid4()), "name": "Bùi Thị Lan", "email": "lan.bui@student.com", "age": 6}
+            {"name": "Nguyễn Văn An", "email": "an.nguyen@student.com", "age": 7},
+            {"name": "Trần Thị Bình", "email": "binh.tran@student.com", "age": 6},
+            {"name": "Lê Văn Cường", "email": "cuong.le@student.com", "age": 7},
+            {"name": "Phạm Thị Dung", "email": "dung.pham@student.com", "age": 6},
+            {"name": "Hoàng Văn Em", "email": "em.hoang@student.com", "age": 7},
+            {"name": "Vũ Thị Hoa", "email": "hoa.vu@student.com", "age": 6},
+            {"name": "Đặng Văn Khoa", "email": "khoa.dang@student.com", "age": 7},
+            {"name": "Bùi Thị Lan", "email": "lan.bui@student.com", "age": 6}
         ]
         
-        for user in users_data:
-            user["createdAt"] = self.generate_timestamp(30)
-            user["updatedAt"] = self.generate_timestamp(1)
+        created_at = self.generate_timestamp(30)
+        updated_at = self.generate_timestamp(1)
+        for user, user_id in zip(users_data, _bulk_uuids(len(users_data))):
+            user["id"] = user_id
+            user["createdAt"] = created_at
+            user["updatedAt"] = updated_at
         
         query = """
+        UNWIND $rows AS r
         CREATE (u:User {
-            id: $id,
-            name: $name,
-            email: $email,
-            age: $age,
-            createdAt: $createdAt,
-            updatedAt: $updatedAt
+            id: r.id,
+            name: r.name,
+            email: r.email,
+            age: r.age,
+            createdAt: r.createdAt,
+            updatedAt: r.updatedAt
         })
         """
         
-        with self.driver.session() as session:
-            for user_data in users_data:
-                session.run(query, user_data)
+        self._run_unwind(session, query, users_data)
         
         print(f"👥 Đã tạo {len(users_data)} users")
         return [u["id"] for u in users_data]
 
-    def create_grade(self):
+    def create_grade(self, session):
         """Tạo dữ liệu Grade"""
         grade_data = {
             "id": str(uuid.uuid4()),
@@ -170,13 +289,12 @@ class Neo4jEducationImporter:
         })
         """
         
-        with self.driver.session() as session:
-            session.run(query, grade_data)
+        session.run(query, grade_data)
         
         print(f"🎓 Đã tạo grade: {grade_data['name']}")
         return grade_data["id"]
 
-    def create_subject(self, grade_id):
+    def create_subject(self, session, grade_id):
         """Tạo dữ liệu Subject"""
         subject_data = {
             "id": str(uuid.uuid4()),
@@ -199,8 +317,7 @@ class Neo4jEducationImporter:
         })
         """
         
-        with self.driver.session() as session:
-            session.run(query, subject_data)
+        session.run(query, subject_data)
         
         # Tạo relationship với Grade
         relationship_query = """
@@ -209,16 +326,15 @@ class Neo4jEducationImporter:
         CREATE (s)-[:BELONGS_TO_GRADE]->(g)
         """
         
-        with self.driver.session() as session:
-            session.run(relationship_query, {
-                "grade_id": grade_id,
-                "subject_id": subject_data["id"]
-            })
+        session.run(relationship_query, {
+            "grade_id": grade_id,
+            "subject_id": subject_data["id"]
+        })
         
         print(f"📚 Đã tạo subject: {subject_data['name']}")
         return subject_data["id"]
 
-    def create_type_book(self, subject_id):
+    def create_type_book(self, session, subject_id):
         """Tạo dữ liệu TypeBook"""
         type_book_data = {
             "id": str(uuid.uuid4()),
@@ -243,8 +359,7 @@ class Neo4jEducationImporter:
         })
         """
         
-        with self.driver.session() as session:
-            session.run(query, type_book_data)
+        session.run(query, type_book_data)
         
         # Tạo relationship với Subject
         relationship_query = """
@@ -253,22 +368,27 @@ class Neo4jEducationImporter:
         CREATE (tb)-[:BELONGS_TO_SUBJECT]->(s)
         """
         
-        with self.driver.session() as session:
-            session.run(relationship_query, {
-                "subject_id": subject_id,
-                "type_book_id": type_book_data["id"]
-            })
+        session.run(relationship_query, {
+            "subject_id": subject_id,
+            "type_book_id": type_book_data["id"]
+        })
         
         print(f"📖 Đã tạo type book: {type_book_data['name']}")
         return type_book_data["id"]
 
-    def create_chapters_and_lessons(self, type_book_id):
-        """Tạo dữ liệu Chapters và Lessons từ JSON data"""
-        # Lấy danh sách unique chapters và lessons
+    def build_curriculum_rows(self):
+        """Duyệt JSON data một lần để tạo rows cho Chapters, Lessons và Questions"""
         chapters_dict = {}
         lessons_dict = {}
-        
-        for item in self.math_data:
+        questions_data = []
+        lesson_counter = defaultdict(int)  # số lesson đã gặp trong mỗi chapter
+        question_ids = _bulk_uuids(len(self.math_data))
+        chapter_created_at = self.generate_timestamp(40)
+        lesson_created_at = self.generate_timestamp(35)
+        question_created_at = self.generate_timestamp(30)
+        updated_at = self.generate_timestamp(1)
+        
+        for item, question_id in zip(self.math_data, question_ids):
             chapter_name = item["chaper"]  # Note: "chaper" từ JSON gốc
             lesson_name = item["lessons"]
             
@@ -278,168 +398,134 @@ class Neo4jEducationImporter:
                     "name": chapter_name,
                     "description": f"Chương học: {chapter_name}",
                     "order": len(chapters_dict) + 1,
-                    "createdAt": self.generate_timestamp(40),
-                    "updatedAt": self.generate_timestamp(1)
+                    "createdAt": chapter_created_at,
+                    "updatedAt": updated_at
                 }
             
             lesson_key = f"{chapter_name}||{lesson_name}"
-            if lesson_key not in lessons_dict:
-                lessons_dict[lesson_key] = {
+            lesson = lessons_dict.get(lesson_key)
+            if lesson is None:
+                lesson_counter[chapter_name] += 1
+                lesson = lessons_dict[lesson_key] = {
                     "id": str(uuid.uuid4()),
                     "name": lesson_name,
                     "description": f"Bài học: {lesson_name}",
-                    "order": len([k for k in lessons_dict.keys() if k.startswith(chapter_name)]) + 1,
-                    "chapter_id": chapters_dict[chapter_name]["id"],
-                    "chapter_name": chapter_name,
-                    "createdAt": self.generate_timestamp(35),
-                    "updatedAt": self.generate_timestamp(1)
+                    "order": lesson_counter[chapter_name],
+                    "createdAt": lesson_created_at,
+                    "updatedAt": updated_at
                 }
+            
+            questions_data.append({
+                "id": question_id,
+                "title": item["title"],
+                "content": item["questions"],
+                "correct_answer": item["answers"],
+                "difficulty": item["difficulty"],
+                "page": item["page"],
+                "image_question": item.get("image_question", ""),
+                "image_answer": item.get("image_answer", ""),
+                "chapter": chapters_dict[chapter_name],
+                "lesson": lesson,
+                "createdAt": question_created_at,
+                "updatedAt": updated_at
+            })
         
-        # Tạo chapters
-        chapter_query = """
-        CREATE (c:Chapter {
-            id: $id,
-            name: $name,
-            description: $description,
-            order: $order,
-            createdAt: $createdAt,
-            updatedAt: $updatedAt
-        })
-        """
-        
-        with self.driver.session() as session:
-            for chapter_data in chapters_dict.values():
-                session.run(chapter_query, chapter_data)
+        return chapters_dict, lessons_dict, questions_data
+
+    def create_curriculum(self, session, type_book_id):
+        """Tạo Chapters, Lessons, Questions cùng các relationship trong một query UNWIND"""
+        chapters_dict, lessons_dict, questions_data = self.build_curriculum_rows()
         
-        # Tạo relationship Chapter -> TypeBook
-        chapter_relationship_query = """
+        # Mỗi row là một câu hỏi kèm chapter/lesson cha; MERGE theo id để chapter/lesson
+        # lặp lại giữa các row chỉ được tạo một lần
+        query = """
         MATCH (tb:TypeBook {id: $type_book_id})
-        MATCH (c:Chapter {id: $chapter_id})
-        CREATE (c)-[:BELONGS_TO_TYPE_BOOK]->(tb)
-        """
-        
-        with self.driver.session() as session:
-            for chapter_data in chapters_dict.values():
-                session.run(chapter_relationship_query, {
-                    "type_book_id": type_book_id,
-                    "chapter_id": chapter_data["id"]
-                })
-        
-        # Tạo lessons
-        lesson_query = """
-        CREATE (l:Lesson {
-            id: $id,
-            name: $name,
-            description: $description,
-            order: $order,
-            createdAt: $createdAt,
-            updatedAt: $updatedAt
-        })
+        UNWIND $rows AS r
+        MERGE (c:Chapter {id: r.chapter.id})
+          ON CREATE SET c.name = r.chapter.name,
+                        c.description = r.chapter.description,
+                        c.order = r.chapter.order,
+                        c.createdAt = r.chapter.createdAt,
+                        c.updatedAt = r.chapter.updatedAt
+        MERGE (c)-[:BELONGS_TO_TYPE_BOOK]->(tb)
+        MERGE (l:Lesson {id: r.lesson.id})
+          ON CREATE SET l.name = r.lesson.name,
+                        l.description = r.lesson.description,
+                        l.order = r.lesson.order,
+                        l.createdAt = r.lesson.createdAt,
+                        l.updatedAt = r.lesson.updatedAt
+        MERGE (l)-[:BELONGS_TO_CHAPTER]->(c)
+        CREATE (q:Question {
+            id: r.id,
+            title: r.title,
+            content: r.content,
+            correct_answer: r.correct_answer,
+            difficulty: r.difficulty,
+            page: r.page,
+            image_question: r.image_question,
+            image_answer: r.image_answer,
+            createdAt: r.createdAt,
+            updatedAt: r.updatedAt
+        })-[:BELONGS_TO_LESSON]->(l)
         """
         
-        with self.driver.session() as session:
-            for lesson_data in lessons_dict.values():
-                session.run(lesson_query, {
-                    "id": lesson_data["id"],
-                    "name": lesson_data["name"],
-                    "description": lesson_data["description"],
-                    "order": lesson_data["order"],
-                    "createdAt": lesson_data["createdAt"],
-                    "updatedAt": lesson_data["updatedAt"]
-                })
-        
-        # Tạo relationship Lesson -> Chapter
-        lesson_relationship_query = """
-        MATCH (c:Chapter {id: $chapter_id})
-        MATCH (l:Lesson {id: $lesson_id})
-        CREATE (l)-[:BELONGS_TO_CHAPTER]->(c)
-        """
-        
-        with self.driver.session() as session:
-            for lesson_data in lessons_dict.values():
-                session.run(lesson_relationship_query, {
-                    "chapter_id": lesson_data["chapter_id"],
-                    "lesson_id": lesson_data["id"]
-                })
+        self._run_unwind(session, query, questions_data, type_book_id=type_book_id)
         
         print(f"📑 Đã tạo {len(chapters_dict)} chapters và {len(lessons_dict)} lessons")
-        return chapters_dict, lessons_dict
+        print(f"❓ Đã tạo {len(questions_data)} questions")
+        return [q["id"] for q in questions_data]
 
-    def create_questions(self, lessons_dict):
-        """Tạo dữ liệu Questions từ JSON data"""
-        questions_data = []
+    def _create_answers_with_apoc(self, session, answers_data):
+        """
+        Tạo answers bằng apoc.periodic.iterate để server tự chia lô
         
-        for item in self.math_data:
-            lesson_key = f"{item['chaper']}||{item['lessons']}"
-            if lesson_key in lessons_dict:
-                lesson_id = lessons_dict[lesson_key]["id"]
-                
-                question_data = {
-                    "id": str(uuid.uuid4()),
-                    "title": item["title"],
-                    "content": item["questions"],
-                    "correct_answer": item["answers"],
-                    "difficulty": item["difficulty"],
-                    "page": item["page"],
-                    "image_question": item.get("image_question", ""),
-                    "image_answer": item.get("image_answer", ""),
-                    "lesson_id": lesson_id,
-                    "createdAt": self.generate_timestamp(30),
-                    "updatedAt": self.generate_timestamp(1)
-                }
-                questions_data.append(question_data)
+        Các lô chạy tuần tự (parallel: false): nhiều lô cùng tạo relationship tới
+        cùng một node Question sẽ tranh khóa / deadlock nếu chạy song song.
         
-        # Tạo questions
+        Returns:
+            bool: False nếu server không có APOC hoặc có lô bị lỗi
+                  (khi đó answers của lần chạy này đã được dọn, cần dùng cách ghi phía client)
+        """
         query = """
-        CREATE (q:Question {
-            id: $id,
-            title: $title,
-            content: $content,
-            correct_answer: $correct_answer,
-            difficulty: $difficulty,
-            page: $page,
-            image_question: $image_question,
-            image_answer: $image_answer,
-            createdAt: $createdAt,
-            updatedAt: $updatedAt
-        })
+        CALL apoc.periodic.iterate(
+            "UNWIND $rows AS r RETURN r",
+            $action,
+            {batchSize: 1000, parallel: false, retries: 3, params: {rows: $rows}}
+        )
+        YIELD committedOperations, failedOperations, errorMessages
+        RETURN committedOperations, failedOperations, errorMessages
         """
         
-        with self.driver.session() as session:
-            for question_data in questions_data:
-                session.run(query, {
-                    "id": question_data["id"],
-                    "title": question_data["title"],
-                    "content": question_data["content"],
-                    "correct_answer": question_data["correct_answer"],
-                    "difficulty": question_data["difficulty"],
-                    "page": question_data["page"],
-                    "image_question": question_data["image_question"],
-                    "image_answer": question_data["image_answer"],
-                    "createdAt": question_data["createdAt"],
-                    "updatedAt": question_data["updatedAt"]
-                })
-        
-        # Tạo relationship Question -> Lesson
-        relationship_query = """
-        MATCH (l:Lesson {id: $lesson_id})
-        MATCH (q:Question {id: $question_id})
-        CREATE (q)-[:BELONGS_TO_LESSON]->(l)
-        """
+        try:
+            record = session.run(query, rows=answers_data, action=ANSWER_WRITE_CYPHER).single()
+        except ClientError as e:
+            if e.code == "Neo.ClientError.Procedure.ProcedureNotFound":
+                print("  ⚠️ Không có APOC, chuyển sang ghi answers từ client")
+                return False
+            raise
         
-        with self.driver.session() as session:
-            for question_data in questions_data:
-                session.run(relationship_query, {
-                    "lesson_id": question_data["lesson_id"],
-                    "question_id": question_data["id"]
-                })
+        if record["failedOperations"]:
+            # Các lô khác đã commit: xóa answers của lần chạy này rồi để cách ghi phía client làm lại
+            print(f"  ⚠️ APOC lỗi {record['failedOperations']} answers: {record['errorMessages']}")
+            self._run_unwind(
+                session,
+                "UNWIND $rows AS answer_id MATCH (a:Answer {id: answer_id}) DETACH DELETE a",
+                [a["id"] for a in answers_data]
+            )
+            print(f"  🧹 Đã xóa {record['committedOperations']} answers ghi dở, chuyển sang ghi từ client")
+            return False
         
-        print(f"❓ Đã tạo {len(questions_data)} questions")
-        return [q["id"] for q in questions_data]
+        print(f"  ⚡ APOC đã ghi {record['committedOperations']} answers")
+        return True
 
-    def create_answers(self, user_ids, question_ids):
+    def create_answers(self, session, user_ids, question_ids):
         """Tạo dữ liệu Answers - câu trả lời của học sinh"""
-        answers_data = []
+        all_answers = []
+        now = datetime.now()
+        
+        # Pool dùng chung cho mọi user: xáo trộn tại chỗ rồi lấy k phần tử đầu,
+        # tránh random.sample tạo bản sao toàn bộ danh sách cho mỗi user
+        question_pool = list(question_ids)
         
         print("✍️ Đang tạo câu trả lời cho từng học sinh...")
         
@@ -453,108 +539,55 @@ class Neo4jEducationImporter:
                 int(len(question_ids) * 0.8)
             )
             
-            selected_questions = random.sample(question_ids, num_questions_to_answer)
+            random.shuffle(question_pool)
+            answer_ids = _bulk_uuids(num_questions_to_answer)
             
-            for question_id in selected_questions:
+            for question_id, answer_id in zip(question_pool, answer_ids):
                 # Thời gian bắt đầu làm bài (trong vòng 30 ngày qua)
-                start_time = self.generate_timestamp(
-                    days_ago=random.randint(1, 30),
-                    hours_ago=random.randint(0, 23),
-                    minutes_ago=random.randint(0, 59)
+                start_datetime = now - timedelta(
+                    days=random.randint(1, 30),
+                    hours=random.randint(0, 23),
+                    minutes=random.randint(0, 59)
                 )
                 
-                # Thời gian hoàn thành (từ 30 giây đến 10 phút sau khi bắt đầu)
-                completion_time_minutes = random.randint(1, 10)
-                completion_time_seconds = random.randint(0, 59)
-                
-                # Tính toán thời gian hoàn thành
-                start_datetime = datetime.fromisoformat(start_time)
-                completion_datetime = start_datetime + timedelta(
-                    minutes=completion_time_minutes, 
-                    seconds=completion_time_seconds
-                )
+                # Thời gian hoàn thành (từ 1 đến 10 phút 59 giây sau khi bắt đầu)
+                duration_seconds = random.randint(1, 10) * 60 + random.randint(0, 59)
+                completion_time = (start_datetime + timedelta(seconds=duration_seconds)).isoformat()
                 
                 # Đánh giá đúng/sai (70% làm đúng, 30% làm sai)
-                is_correct = random.choices([True, False], weights=[70, 30])[0]
+                is_correct = random.random() < 0.7
                 
                 # Tạo câu trả lời của học sinh
-                if is_correct:
-                    student_answer = "Câu trả lời đúng của học sinh"
-                else:
-                    student_answer = "Câu trả lời sai của học sinh"
+                student_answer = CORRECT_ANSWER_TEXT if is_correct else WRONG_ANSWER_TEXT
                 
                 answer_data = {
-                    "id": str(uuid.uuid4()),
+                    "id": answer_id,
                     "student_answer": student_answer,
                     "is_correct": is_correct,
-                    "start_time": start_time,
-                    "completion_time": completion_datetime.isoformat(),
-                    "duration_seconds": completion_time_minutes * 60 + completion_time_seconds,
+                    "start_time": start_datetime.isoformat(),
+                    "completion_time": completion_time,
+                    "duration_seconds": duration_seconds,
                     "user_id": user_id,
                     "question_id": question_id,
-                    "createdAt": completion_datetime.isoformat(),
-                    "updatedAt": completion_datetime.isoformat()
+                    "createdAt": completion_time,
+                    "updatedAt": completion_time
                 }
-                answers_data.append(answer_data)
-        
-        print(f"  📝 Chuẩn bị insert {len(answers_data)} answers vào database...")
+                all_answers.append(answer_data)
         
-        # Tạo answers
-        query = """
-        CREATE (a:Answer {
-            id: $id,
-            student_answer: $student_answer,
-            is_correct: $is_correct,
-            start_time: $start_time,
-            completion_time: $completion_time,
-            duration_seconds: $duration_seconds,
-            createdAt: $createdAt,
-            updatedAt: $updatedAt
-        })
-        """
+        total_answers = len(all_answers)
+        print(f"  📝 Chuẩn bị insert {total_answers} answers vào database...")
         
-        with self.driver.session() as session:
-            for answer_data in answers_data:
-                session.run(query, {
-                    "id": answer_data["id"],
-                    "student_answer": answer_data["student_answer"],
-                    "is_correct": answer_data["is_correct"],
-                    "start_time": answer_data["start_time"],
-                    "completion_time": answer_data["completion_time"],
-                    "duration_seconds": answer_data["duration_seconds"],
-                    "createdAt": answer_data["createdAt"],
-                    "updatedAt": answer_data["updatedAt"]
-                })
-        
-        print("  🔗 Đang tạo relationships...")
-        
-        # Tạo relationships
-        user_relationship_query = """
-        MATCH (u:User {id: $user_id})
-        MATCH (a:Answer {id: $answer_id})
-        CREATE (u)-[:ANSWERED]->(a)
-        """
+        # Tạo answers cùng relationship User -> Answer -> Question trong cùng một query
+        query = "UNWIND $rows AS r " + ANSWER_WRITE_CYPHER
         
-        question_relationship_query = """
-        MATCH (q:Question {id: $question_id})
-        MATCH (a:Answer {id: $answer_id})
-        CREATE (a)-[:ANSWERS_QUESTION]->(q)
-        """
+        if not self._create_answers_with_apoc(session, all_answers):
+            # Ghi tuần tự: các user cùng tạo relationship tới chung các node Question,
+            # ghi song song sẽ tranh khóa / deadlock mà không nhanh hơn với vài nghìn dòng
+            print("  🔗 Đang ghi answers và relationships...")
+            self._run_unwind(session, query, all_answers)
         
-        with self.driver.session() as session:
-            for answer_data in answers_data:
-                session.run(user_relationship_query, {
-                    "user_id": answer_data["user_id"],
-                    "answer_id": answer_data["id"]
-                })
-                
-                session.run(question_relationship_query, {
-                    "question_id": answer_data["question_id"],
-                    "answer_id": answer_data["id"]
-                })
-        
-        print(f"✅ Đã tạo {len(answers_data)} answers")
-        return len(answers_data)
+        print(f"✅ Đã tạo {total_answers} answers")
+        return total_answers
 
     def run_import(self):
         """Chạy toàn bộ quá trình import dữ liệu"""
@@ -564,22 +597,25 @@ class Neo4jEducationImporter:
             
             # Kết nối và chuẩn bị database
             self.connect()
-            self.clear_database()
-            self.create_constraints_and_indexes()
             
-            # Import dữ liệu theo cấu trúc phân cấp
-            print("\n📊 Đang tạo cấu trúc dữ liệu...")
-            user_ids = self.create_users()
-            grade_id = self.create_grade()
-            subject_id = self.create_subject(grade_id)
-            type_book_id = self.create_type_book(subject_id)
-            chapters_dict, lessons_dict = self.create_chapters_and_lessons(type_book_id)
-            question_ids = self.create_questions(lessons_dict)
-            total_answers = self.create_answers(user_ids, question_ids)
-            
-            print("\n✅ Import dữ liệu hoàn tất!")
-            print("\n📈 Thống kê dữ liệu đã tạo:")
-            self.print_statistics()
+            # Dùng chung một session cho toàn bộ các bước import
+            with self.driver.session() as session:
+                self.clear_database(session)
+                self.create_constraints_and_indexes(session)
+                
+                # Import dữ liệu theo cấu trúc phân cấp
+                print("\n📊 Đang tạo cấu trúc dữ liệu...")
+                user_ids = self.create_users(session)
+                grade_id = self.create_grade(session)
+                subject_id = self.create_subject(session, grade_id)
+                type_book_id = self.create_type_book(session, subject_id)
+                question_ids = self.create_curriculum(session, type_book_id)
+                total_answers = self.create_answers(session, user_ids, question_ids)
+                
+                print("\n✅ Import dữ liệu hoàn tất!")
+                self._warm_cache(session)
+                print("\n📈 Thống kê dữ liệu đã tạo:")
+                self.print_statistics(session)
             
         except Exception as e:
             print(f"❌ Lỗi trong quá trình import: {e}")
@@ -587,7 +623,20 @@ class Neo4jEducationImporter:
         finally:
             self.close()
 
-    def print_statistics(self):
+    def _warm_cache(self, session):
+        """Nạp store vào page cache trước các query thống kê"""
+        try:
+            session.run("CALL apoc.warmup.run(true, true, true)").consume()
+        except ClientError as e:
+            if e.code != "Neo.ClientError.Procedure.ProcedureNotFound":
+                raise
+            # Không có APOC: quét toàn bộ node và relationship một lần
+            # (đọc n.id để không bị trả lời thẳng từ count store)
+            session.run(
+                "MATCH (n) OPTIONAL MATCH (n)-[r]->() RETURN count(n.id) + count(r)"
+            ).consume()
+
+    def print_statistics(self, session):
         """In thống kê dữ liệu đã tạo"""
         queries = {
             "Users": "MATCH (u:User) RETURN count(u) as count",
@@ -600,11 +649,10 @@ class Neo4jEducationImporter:
             "Answers": "MATCH (a:Answer) RETURN count(a) as count"
         }
         
-        with self.driver.session() as session:
-            for entity, query in queries.items():
-                result = session.run(query)
-                count = result.single()["count"]
-                print(f"  • {entity}: {count}")
+        for entity, query in queries.items():
+            result = session.run(query)
+            count = result.single()["count"]
+            print(f"  • {entity}: {count}")
 
     def verify_relationships(self):
         """Kiểm tra các mối quan hệ đã được tạo đúng"""
@@ -627,53 +675,7 @@ class Neo4jEducationImporter:
 
     def get_sample_queries(self):
         """Trả về các query mẫu để khám phá dữ liệu"""
-        queries = {
-            "Xem tất cả users": "MATCH (u:User) RETURN u",
-            "Xem progress của từng học sinh": """
-                MATCH (u:User)-[:ANSWERED]->(a:Answer)-[:ANSWERS_QUESTION]->(q:Question)
-                RETURN u.name as student_name, 
-                       count(q) as total_questions, 
-                       count(CASE WHEN a.is_correct = true THEN 1 END) as correct_answers,
-                       round(100.0 * count(CASE WHEN a.is_correct = true THEN 1 END) / count(q), 2) as accuracy_percentage
-                ORDER BY accuracy_percentage DESC
-            """,
-            "Xem câu hỏi khó nhất": """
-                MATCH (q:Question)<-[:ANSWERS_QUESTION]-(a:Answer)
-                RETURN q.title, q.difficulty, q.page,
-                       count(a) as total_attempts,
-                       count(CASE WHEN a.is_correct = true THEN 1 END) as correct_attempts,
-                       round(100.0 * count(CASE WHEN a.is_correct = true THEN 1 END) / count(a), 2) as success_rate
-                ORDER BY success_rate ASC
-                LIMIT 10
-            """,
-            "Xem thời gian làm bài trung bình": """
-                MATCH (u:User)-[:ANSWERED]->(a:Answer)
-                RETURN u.name as student_name, 
-                       round(avg(a.duration_seconds), 0) as avg_duration_seconds,
-                       round(avg(a.duration_seconds)/60.0, 1) as avg_duration_minutes
-                ORDER BY avg_duration_seconds
-            """,
-            "Xem cấu trúc dữ liệu đầy đủ": """
-                MATCH path = (u:User)-[:ANSWERED]->(a:Answer)-[:ANSWERS_QUESTION]->(q:Question)
-                            -[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
-                            -[:BELONGS_TO_TYPE_BOOK]->(tb:TypeBook)-[:BELONGS_TO_SUBJECT]->(s:Subject)
-                            -[:BELONGS_TO_GRADE]->(g:Grade)
-                RETURN u.name as student, c.name as chapter, l.name as lesson, 
-                       q.title as question, a.is_correct as correct, a.duration_seconds as duration
-                LIMIT 10
-            """,
-            "Thống kê theo chapter": """
-                MATCH (c:Chapter)<-[:BELONGS_TO_LESSON]-(l:Lesson)<-[:BELONGS_TO_QUESTION]-(q:Question)
-                      <-[:ANSWERS_QUESTION]-(a:Answer)
-                RETURN c.name as chapter_name,
-                       count(DISTINCT q) as total_questions,
-                       count(a) as total_attempts,
-                       count(CASE WHEN a.is_correct = true THEN 1 END) as correct_attempts,
-                       round(100.0 * count(CASE WHEN a.is_correct = true THEN 1 END) / count(a), 2) as success_rate
-                ORDER BY success_rate DESC
-            """
-        }
-        return queries
+        return type(self).SAMPLE_QUERIES
 
 
 def check_environment():
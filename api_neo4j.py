@@ -6,15 +6,29 @@ Based on: Subject → TypeBook → Chapter → Lesson → Question
 
 import os
 import json
+import base64
+import gzip
+import hashlib
+import io
+import queue
 import uuid
+import time
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from functools import wraps
-from flask import Flask, request, jsonify
+from functools import wraps, lru_cache
+from flask import Flask, request, jsonify, Response, make_response, stream_with_context, g
 from flask_cors import CORS
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, RoutingControl, READ_ACCESS, WRITE_ACCESS
 import logging
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +37,166 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
+# Uniqueness constraints backing the id/email lookups (names match add_data.py),
+# plus indexes for the knowledge filters, answer time ordering and student name ordering
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE",
+    "CREATE CONSTRAINT user_email_unique IF NOT EXISTS FOR (u:User) REQUIRE u.email IS UNIQUE",
+    "CREATE CONSTRAINT subject_id_unique IF NOT EXISTS FOR (s:Subject) REQUIRE s.id IS UNIQUE",
+    "CREATE CONSTRAINT type_book_id_unique IF NOT EXISTS FOR (t:TypeBook) REQUIRE t.id IS UNIQUE",
+    "CREATE CONSTRAINT chapter_id_unique IF NOT EXISTS FOR (c:Chapter) REQUIRE c.id IS UNIQUE",
+    "CREATE CONSTRAINT lesson_id_unique IF NOT EXISTS FOR (l:Lesson) REQUIRE l.id IS UNIQUE",
+    "CREATE CONSTRAINT question_id_unique IF NOT EXISTS FOR (q:Question) REQUIRE q.id IS UNIQUE",
+    "CREATE CONSTRAINT answer_id_unique IF NOT EXISTS FOR (a:Answer) REQUIRE a.id IS UNIQUE",
+    "CREATE CONSTRAINT knowledge_id_unique IF NOT EXISTS FOR (k:Knowledge) REQUIRE k.id IS UNIQUE",
+    "CREATE CONSTRAINT knowledge_name_unique IF NOT EXISTS FOR (k:Knowledge) REQUIRE (k.name, k.subject, k.grade) IS UNIQUE",
+    "CREATE INDEX knowledge_subject_grade IF NOT EXISTS FOR (k:Knowledge) ON (k.subject, k.grade)",
+    "CREATE INDEX answer_completion_time IF NOT EXISTS FOR (a:Answer) ON (a.completion_time)",
+    "CREATE INDEX user_name IF NOT EXISTS FOR (u:User) ON (u.name)"
+]
+
+# Route queries, kept as module constants so warm_up() can pre-plan the exact strings.
+# Rows come back as map projections so each record is already the response dict.
+Q_SUBJECTS = "MATCH (s:Subject) RETURN s{.*} as s ORDER BY s.name"
+
+# Filtered variants anchor on {id: $x} so the planner can seek on the id constraint;
+# the route picks the constant for its filter shape, and each shape keeps its own cached plan.
+Q_TYPEBOOKS = """
+    MATCH (s:Subject)<-[:BELONGS_TO_SUBJECT]-(t:TypeBook)
+    RETURN t{.*, subject_name: s.name} as t
+    ORDER BY s.name, t.name
+"""
+
+Q_TYPEBOOKS_BY_SUBJECT = """
+    MATCH (s:Subject {id: $subject_id})<-[:BELONGS_TO_SUBJECT]-(t:TypeBook)
+    RETURN t{.*, subject_name: s.name} as t
+    ORDER BY t.name
+"""
+
+Q_CHAPTERS = """
+    MATCH (t:TypeBook)<-[:BELONGS_TO_TYPE_BOOK]-(c:Chapter)
+    RETURN c{.*, typebook_name: t.name} as c
+    ORDER BY t.name, c.order
+"""
+
+Q_CHAPTERS_BY_TYPEBOOK = """
+    MATCH (t:TypeBook {id: $typebook_id})<-[:BELONGS_TO_TYPE_BOOK]-(c:Chapter)
+    RETURN c{.*, typebook_name: t.name} as c
+    ORDER BY c.order
+"""
+
+Q_LESSONS = """
+    MATCH (c:Chapter)<-[:BELONGS_TO_CHAPTER]-(l:Lesson)
+    RETURN l{.*, chapter_name: c.name} as l
+    ORDER BY c.order, l.order
+"""
+
+Q_LESSONS_BY_CHAPTER = """
+    MATCH (c:Chapter {id: $chapter_id})<-[:BELONGS_TO_CHAPTER]-(l:Lesson)
+    RETURN l{.*, chapter_name: c.name} as l
+    ORDER BY l.order
+"""
+
+Q_QUESTIONS = """
+    MATCH (q:Question)-[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
+    MATCH (c)-[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)
+    MATCH (t)-[:BELONGS_TO_SUBJECT]->(s:Subject)
+    RETURN q{.*, lesson_name: l.name, chapter_name: c.name,
+           typebook_name: t.name, subject_name: s.name} as q
+    ORDER BY s.name, t.name, c.order, l.order, q.page, q.id
+    SKIP $offset LIMIT $limit
+"""
+
+Q_QUESTIONS_BY_LESSON = """
+    MATCH (q:Question)-[:BELONGS_TO_LESSON]->(l:Lesson {id: $lesson_id})
+    MATCH (l)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
+    MATCH (c)-[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)
+    MATCH (t)-[:BELONGS_TO_SUBJECT]->(s:Subject)
+    RETURN q{.*, lesson_name: l.name, chapter_name: c.name,
+           typebook_name: t.name, subject_name: s.name} as q
+    ORDER BY q.page, q.id
+    SKIP $offset LIMIT $limit
+"""
+
+Q_QUESTIONS_BY_CHAPTER = """
+    MATCH (q:Question)-[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter {id: $chapter_id})
+    MATCH (c)-[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)
+    MATCH (t)-[:BELONGS_TO_SUBJECT]->(s:Subject)
+    RETURN q{.*, lesson_name: l.name, chapter_name: c.name,
+           typebook_name: t.name, subject_name: s.name} as q
+    ORDER BY l.order, q.page, q.id
+    SKIP $offset LIMIT $limit
+"""
+
+Q_USERS = "MATCH (u:User) RETURN u{.*} as u ORDER BY u.name, u.id SKIP $offset LIMIT $limit"
+
+Q_EXPORT_USERS = "MATCH (u:User) RETURN u{.*} as u"
+
+Q_EXPORT_QUESTIONS = """
+    MATCH (q:Question)-[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
+    MATCH (c)-[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)
+    MATCH (t)-[:BELONGS_TO_SUBJECT]->(s:Subject)
+    RETURN q{.*, lesson_name: l.name, chapter_name: c.name,
+           typebook_name: t.name, subject_name: s.name} as q
+"""
+
+Q_EXPORT_ANSWERS = """
+    MATCH (u:User)-[:ANSWERED]->(a:Answer)-[:ANSWERS_QUESTION]->(q:Question)
+    MATCH (q)-[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
+    RETURN a{.*, user_id: u.id, question_id: q.id,
+           student_name: u.name, question_title: q.title,
+           lesson_name: l.name, chapter_name: c.name} as a
+"""
+
+# Builds the nested tree server-side: one fully shaped row per subject, ordered like the flat listing
+Q_TREE_HIERARCHY = """
+    MATCH (s:Subject)<-[:BELONGS_TO_SUBJECT]-(t:TypeBook)<-[:BELONGS_TO_TYPE_BOOK]-(c:Chapter)<-[:BELONGS_TO_CHAPTER]-(l:Lesson)
+    CALL {
+        WITH l
+        OPTIONAL MATCH (l)<-[:BELONGS_TO_LESSON]-(q:Question)
+        WHERE $include_questions
+        RETURN collect(q{.id, .title, .page}) as questions
+    }
+    WITH s, t, c, l, questions ORDER BY l.order
+    WITH s, t, c, collect(CASE WHEN $include_questions
+        THEN {id: l.id, name: l.name, order: l.order, type: 'lesson', questions: questions}
+        ELSE {id: l.id, name: l.name, order: l.order, type: 'lesson'} END) as lessons
+    ORDER BY c.order
+    WITH s, t, collect({id: c.id, name: c.name, order: c.order, type: 'chapter', lessons: lessons}) as chapters
+    ORDER BY t.name
+    WITH s, collect({id: t.id, name: t.name, type: 'typebook', chapters: chapters}) as typebooks
+    RETURN {id: s.id, name: s.name, type: 'subject', typebooks: typebooks} as subject
+    ORDER BY s.name
+"""
+
+Q_TREE_USERS = "MATCH (u:User) RETURN u.id as id, u.name as name, u.email as email ORDER BY u.name"
+
+# Parameter names per warm-up query; EXPLAIN only needs them bound, values are irrelevant
+WARMUP_QUERIES = [
+    (Q_SUBJECTS, {}),
+    (Q_TYPEBOOKS, {}),
+    (Q_TYPEBOOKS_BY_SUBJECT, {'subject_id': ''}),
+    (Q_CHAPTERS, {}),
+    (Q_CHAPTERS_BY_TYPEBOOK, {'typebook_id': ''}),
+    (Q_LESSONS, {}),
+    (Q_LESSONS_BY_CHAPTER, {'chapter_id': ''}),
+    (Q_QUESTIONS, {'offset': 0, 'limit': 1}),
+    (Q_QUESTIONS_BY_LESSON, {'lesson_id': '', 'offset': 0, 'limit': 1}),
+    (Q_QUESTIONS_BY_CHAPTER, {'chapter_id': '', 'offset': 0, 'limit': 1}),
+    (Q_USERS, {'offset': 0, 'limit': 1}),
+    (Q_EXPORT_USERS, {}),
+    (Q_EXPORT_QUESTIONS, {}),
+    (Q_EXPORT_ANSWERS, {}),
+    (Q_TREE_HIERARCHY, {'include_questions': True}),
+    (Q_TREE_USERS, {}),
+]
+
+# Touches the hierarchy nodes so their store pages are loaded before the first request
+WARMUP_PAGECACHE = """
+    MATCH (n) WHERE n:Subject OR n:TypeBook OR n:Chapter OR n:Lesson
+    RETURN count(n.id) as warmed
+"""
+
 class Neo4jEducationAPI:
     def __init__(self):
         self.uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
@@ -33,13 +207,68 @@ class Neo4jEducationAPI:
         
     def connect(self):
         try:
-            self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+            self.driver = GraphDatabase.driver(
+                self.uri,
+                auth=(self.user, self.password),
+                max_connection_pool_size=int(os.getenv("NEO4J_POOL_SIZE", "50")),
+                connection_acquisition_timeout=float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30")),
+                max_connection_lifetime=int(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600")),
+                connection_timeout=float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "15")),
+                keep_alive=True
+            )
             with self.driver.session() as session:
                 session.run("RETURN 1")
             logger.info("✅ Connected to Neo4j")
         except Exception as e:
             logger.error(f"❌ Neo4j connection failed: {e}")
             raise
+        self.ensure_schema()
+        self.warm_up()
+    
+    def ensure_schema(self):
+        """Create the constraints and indexes used by the route lookups (idempotent)"""
+        with self.driver.session() as session:
+            for statement in SCHEMA_STATEMENTS:
+                try:
+                    session.run(statement).consume()
+                except Exception as e:
+                    # e.g. existing duplicate emails; keep serving, lookups just fall back to scans
+                    logger.warning(f"⚠️ Schema statement skipped: {e}")
+    
+    def warm_up(self):
+        """Compile the route query plans and load hierarchy pages so the first requests run warm"""
+        started = time.perf_counter()
+        with self.driver.session() as session:
+            for query, params in WARMUP_QUERIES:
+                try:
+                    # Plans are cached by query text, EXPLAIN compiles without executing
+                    session.run("EXPLAIN " + query, params).consume()
+                except Exception as e:
+                    logger.warning(f"⚠️ Query warm-up skipped: {e}")
+            try:
+                session.run(WARMUP_PAGECACHE).consume()
+            except Exception as e:
+                logger.warning(f"⚠️ Page cache warm-up skipped: {e}")
+        logger.info(f"🔥 Warmed {len(WARMUP_QUERIES)} query plans in {time.perf_counter() - started:.2f}s")
+    
+    def read_session(self):
+        """Session routed to readers; shares the execute_query bookmarks so it sees earlier writes"""
+        return self.driver.session(
+            default_access_mode=READ_ACCESS,
+            bookmark_manager=self.driver.execute_query_bookmark_manager
+        )
+    
+    def write_session(self):
+        """Session routed to the leader; its commits are recorded for later read sessions"""
+        return self.driver.session(
+            default_access_mode=WRITE_ACCESS,
+            bookmark_manager=self.driver.execute_query_bookmark_manager
+        )
+    
+    def read_query(self, query, **params):
+        """Run a read-only query via execute_query (managed session, retries, read routing)"""
+        records, _, _ = self.driver.execute_query(query, params, routing_=RoutingControl.READ)
+        return records
     
     def close(self):
         if self.driver:
@@ -69,13 +298,262 @@ def validate_json(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def _props(entity):
+    """Copy a node's or relationship's properties into a plain dict"""
+    # The driver already holds the properties as a dict; copying it skips the items() round-trip
+    return entity._properties.copy()
+
+def _dumps(obj):
+    """Serialize to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        # Non-string keys (e.g. numeric buckets) are stringified like the stdlib encoder does
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=str, ensure_ascii=False).encode('utf-8')
+
+def _json_response(payload, status=200):
+    """Build a JSON Response without going through jsonify's stdlib encoder"""
+    if orjson is None:
+        response = jsonify(payload)
+        response.status_code = status
+        return response
+    return Response(_dumps(payload), status=status, mimetype='application/json')
+
+# ==================== RESPONSE CACHE ====================
+
+# In-process TTL cache for near-static GET endpoints (per worker process)
+CACHE_TTL = int(os.getenv('API_CACHE_TTL', 300))
+CACHE_MAX_ENTRIES = int(os.getenv('API_CACHE_MAX_ENTRIES', 1024))
+_response_cache = {}
+_response_cache_lock = threading.Lock()
+
+def cached_route(ttl=None):
+    """Cache successful JSON responses keyed on path + query string for `ttl` seconds.
+    
+    The encoded body is stored, so hits skip both Neo4j and JSON encoding.
+    Responses carry an ETag of the body and `Cache-Control: private, no-cache`,
+    so clients revalidate on every use (a 304 while unchanged) and never keep
+    data that invalidate_cache() has dropped.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            now = time.monotonic()
+            with _response_cache_lock:
+                entry = _response_cache.get(key)
+            if entry and entry[0] > now:
+                response = Response(entry[1], mimetype='application/json')
+                response.set_etag(entry[2])
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response.make_conditional(request)
+            
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and response.mimetype == 'application/json':
+                max_age = ttl or CACHE_TTL
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()
+                with _response_cache_lock:
+                    if len(_response_cache) >= CACHE_MAX_ENTRIES:
+                        # Evict the oldest entry (dicts keep insertion order)
+                        _response_cache.pop(next(iter(_response_cache)))
+                    _response_cache[key] = (now + max_age, body, etag)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response.make_conditional(request)
+            return response
+        return decorated_function
+    return decorator
+
+def invalidate_cache():
+    """Drop every cached response; call after writes that change cached data"""
+    with _response_cache_lock:
+        _response_cache.clear()
+
+# ==================== RESPONSE COMPRESSION ====================
+
+# gzip level trades CPU for size; bodies below the threshold are not worth compressing
+COMPRESS_LEVEL = int(os.getenv('API_COMPRESS_LEVEL', 4))
+COMPRESS_MIN_SIZE = 1024
+
+def gzip_response(f):
+    """Gzip large JSON responses when the client accepts it (stdlib, no extra dependency)"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        response = make_response(f(*args, **kwargs))
+        if ('gzip' not in request.headers.get('Accept-Encoding', '').lower()
+                or response.direct_passthrough
+                or response.status_code != 200
+                or 'Content-Encoding' in response.headers):
+            return response
+        
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_SIZE:
+            return response
+        
+        response.set_data(gzip.compress(body, compresslevel=COMPRESS_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+    return decorated_function
+
+# Bulk clients may gzip their JSON bodies; cap the inflated size so a small upload can't expand unbounded
+MAX_INFLATED_BODY = int(os.getenv('API_MAX_INFLATED_BODY', 32 * 1024 * 1024))
+
+class GzipRequestMiddleware:
+    """WSGI middleware that inflates `Content-Encoding: gzip` request bodies before Flask parses them"""
+    
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+    
+    def __call__(self, environ, start_response):
+        if environ.get('HTTP_CONTENT_ENCODING', '').strip().lower() != 'gzip':
+            return self.wsgi_app(environ, start_response)
+        
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        raw = environ['wsgi.input'].read(length) if length else environ['wsgi.input'].read()
+        # A gzip body may hold several concatenated members; inflate them all under one size cap
+        chunks, size = [], 0
+        while True:
+            try:
+                inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                chunk = inflater.decompress(raw, MAX_INFLATED_BODY + 1 - size)
+            except zlib.error:
+                return self._error(start_response, '400 BAD REQUEST', 'Invalid gzip request body')
+            size += len(chunk)
+            chunks.append(chunk)
+            if size > MAX_INFLATED_BODY or inflater.unconsumed_tail:
+                return self._error(start_response, '413 REQUEST ENTITY TOO LARGE', 'Decompressed request body too large')
+            if not inflater.eof:
+                # Truncated stream: would otherwise reach Flask as a partial JSON body
+                return self._error(start_response, '400 BAD REQUEST', 'Invalid gzip request body')
+            # Trailing zero padding is allowed after the last member, as in the gzip module
+            raw = inflater.unused_data
+            if not raw.strip(b'\x00'):
+                break
+        body = b''.join(chunks)
+        
+        environ['wsgi.input'] = io.BytesIO(body)
+        environ['CONTENT_LENGTH'] = str(len(body))
+        del environ['HTTP_CONTENT_ENCODING']
+        return self.wsgi_app(environ, start_response)
+    
+    @staticmethod
+    def _error(start_response, status, message):
+        body = json.dumps({'error': message, 'success': False}).encode('utf-8')
+        start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+        return [body]
+
+app.wsgi_app = GzipRequestMiddleware(app.wsgi_app)
+
+# ==================== BACKGROUND EXECUTORS ====================
+
+# Shared pool for fanning independent read queries out over separate sessions.
+# A single student detail request fans out 4 queries, so the pool never drops below
+# that; the default leaves room for a few such requests at once (keep it below NEO4J_POOL_SIZE)
+DETAIL_FANOUT = 4
+QUERY_WORKERS = max(DETAIL_FANOUT, int(os.getenv('API_QUERY_WORKERS', 16)))
+_query_executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix='read-fanout')
+
+# ==================== BULK WRITE BATCHES ====================
+
+# Shared pool for opt-in parallel bulk imports; keep it well below NEO4J_POOL_SIZE
+BULK_WORKERS = int(os.getenv('API_BULK_WORKERS', 4))
+_bulk_executor = ThreadPoolExecutor(max_workers=BULK_WORKERS, thread_name_prefix='bulk-write')
+
+def write_batches(tx, query, param, batches, parallel=False):
+    """Run UNWIND batches and return the created rows of each batch.
+    
+    By default every batch runs in the caller's transaction (all-or-nothing).
+    With parallel=True each batch is its own write transaction on the bulk
+    pool, so batches overlap but a failing batch does not undo the others.
+    """
+    if not parallel:
+        return [[_props(record[0]) for record in tx.run(query, {param: batch})] for batch in batches]
+    
+    def run_batch(batch):
+        with neo4j_api.write_session() as session:
+            return session.execute_write(
+                lambda batch_tx: [_props(record[0]) for record in batch_tx.run(query, {param: batch})]
+            )
+    
+    return list(_bulk_executor.map(run_batch, batches))
+
+# ==================== PAGINATION ====================
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def page_limit():
+    """Parse ?limit= clamped to 1..MAX_PAGE_SIZE"""
+    return min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+
+def page_args():
+    """Parse ?limit= and ?cursor= into (limit, offset); raises ValueError on a bad cursor"""
+    limit = page_limit()
+    cursor = request.args.get('cursor')
+    offset = int(base64.urlsafe_b64decode(cursor.encode()).decode()) if cursor else 0
+    if offset < 0:
+        raise ValueError('negative offset')
+    return limit, offset
+
+def page_result(rows, limit, offset):
+    """Trim the extra look-ahead row and return (page, next_cursor or None)"""
+    if len(rows) <= limit:
+        return rows, None
+    next_cursor = base64.urlsafe_b64encode(str(offset + limit).encode()).decode()
+    return rows[:limit], next_cursor
+
+def keyset_args():
+    """Parse ?limit= and a keyset ?cursor= into (limit, [sort_value, id] or None)"""
+    limit = page_limit()
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return limit, None
+    last_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(last_key, list) or len(last_key) != 2:
+        raise ValueError('malformed cursor')
+    return limit, last_key
+
+def keyset_cursor(last_key):
+    """Encode the sort key of the last returned row as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps(last_key).encode()).decode()
+
+# ==================== REQUEST SESSION ====================
+
+def request_session():
+    """Session shared by all queries of the current request, opened on first use.
+    
+    GET requests get a read session, everything else a write session; the
+    session is closed by close_request_session when the request ends.
+    """
+    if 'neo4j_session' not in g:
+        g.neo4j_session = neo4j_api.read_session() if request.method == 'GET' else neo4j_api.write_session()
+    return g.neo4j_session
+
+def _fetch_records(tx, query, params):
+    return list(tx.run(query, params))
+
+def query_read(query, params=None, **kwargs):
+    """Run a read query as a managed transaction on the request session (retried on transient errors)"""
+    return request_session().execute_read(_fetch_records, query, {**(params or {}), **kwargs})
+
+def query_write(query, params=None, **kwargs):
+    """Run a write query as a managed transaction on the request session (retried on transient errors)"""
+    return request_session().execute_write(_fetch_records, query, {**(params or {}), **kwargs})
+
+@app.teardown_request
+def close_request_session(exc):
+    session = g.pop('neo4j_session', None)
+    if session is not None:
+        session.close()
+
 # ==================== HEALTH CHECK ====================
 
 @app.route('/api/v1/health', methods=['GET'])
 @handle_errors
 def health_check():
     """Check API health"""
-    with neo4j_api.driver.session() as session:
+    with neo4j_api.read_session() as session:
         session.run("RETURN 1")
     return jsonify({'status': 'healthy', 'success': True})
 
@@ -83,108 +561,75 @@ def health_check():
 
 @app.route('/api/v1/subjects', methods=['GET'])
 @handle_errors
+@cached_route()
 def get_subjects():
     """Get all subjects"""
-    with neo4j_api.driver.session() as session:
-        result = session.run("MATCH (s:Subject) RETURN s ORDER BY s.name")
-        subjects = [dict(record["s"].items()) for record in result]
-    return jsonify({'subjects': subjects, 'count': len(subjects), 'success': True})
+    result = neo4j_api.read_query(Q_SUBJECTS)
+    subjects = [record["s"] for record in result]
+    return _json_response({'subjects': subjects, 'count': len(subjects), 'success': True})
 
 @app.route('/api/v1/typebooks', methods=['GET'])
 @handle_errors
+@cached_route()
 def get_typebooks():
     """Get all typebooks with subject info"""
     subject_id = request.args.get('subject_id')
     
-    with neo4j_api.driver.session() as session:
-        if subject_id:
-            result = session.run("""
-                MATCH (s:Subject {id: $subject_id})<-[:BELONGS_TO_SUBJECT]-(t:TypeBook)
-                RETURN t, s.name as subject_name
-                ORDER BY t.name
-            """, subject_id=subject_id)
-        else:
-            result = session.run("""
-                MATCH (s:Subject)<-[:BELONGS_TO_SUBJECT]-(t:TypeBook)
-                RETURN t, s.name as subject_name
-                ORDER BY s.name, t.name
-            """)
-        
-        typebooks = []
-        for record in result:
-            typebook = dict(record["t"].items())
-            typebook['subject_name'] = record['subject_name']
-            typebooks.append(typebook)
+    if subject_id:
+        result = neo4j_api.read_query(Q_TYPEBOOKS_BY_SUBJECT, subject_id=subject_id)
+    else:
+        result = neo4j_api.read_query(Q_TYPEBOOKS)
+    typebooks = [record["t"] for record in result]
     
-    return jsonify({'typebooks': typebooks, 'count': len(typebooks), 'success': True})
+    return _json_response({'typebooks': typebooks, 'count': len(typebooks), 'success': True})
 
 @app.route('/api/v1/chapters', methods=['GET'])
 @handle_errors
+@cached_route()
 def get_chapters():
     """Get all chapters with typebook info"""
     typebook_id = request.args.get('typebook_id')
     
-    with neo4j_api.driver.session() as session:
-        if typebook_id:
-            result = session.run("""
-                MATCH (t:TypeBook {id: $typebook_id})<-[:BELONGS_TO_TYPE_BOOK]-(c:Chapter)
-                RETURN c, t.name as typebook_name
-                ORDER BY c.order
-            """, typebook_id=typebook_id)
-        else:
-            result = session.run("""
-                MATCH (t:TypeBook)<-[:BELONGS_TO_TYPE_BOOK]-(c:Chapter)
-                RETURN c, t.name as typebook_name
-                ORDER BY t.name, c.order
-            """)
-        
-        chapters = []
-        for record in result:
-            chapter = dict(record["c"].items())
-            chapter['typebook_name'] = record['typebook_name']
-            chapters.append(chapter)
+    if typebook_id:
+        result = neo4j_api.read_query(Q_CHAPTERS_BY_TYPEBOOK, typebook_id=typebook_id)
+    else:
+        result = neo4j_api.read_query(Q_CHAPTERS)
+    chapters = [record["c"] for record in result]
     
-    return jsonify({'chapters': chapters, 'count': len(chapters), 'success': True})
+    return _json_response({'chapters': chapters, 'count': len(chapters), 'success': True})
 
 @app.route('/api/v1/lessons', methods=['GET'])
 @handle_errors
+@cached_route()
 def get_lessons():
     """Get all lessons with chapter info"""
     chapter_id = request.args.get('chapter_id')
     
-    with neo4j_api.driver.session() as session:
-        if chapter_id:
-            result = session.run("""
-                MATCH (c:Chapter {id: $chapter_id})<-[:BELONGS_TO_CHAPTER]-(l:Lesson)
-                RETURN l, c.name as chapter_name
-                ORDER BY l.order
-            """, chapter_id=chapter_id)
-        else:
-            result = session.run("""
-                MATCH (c:Chapter)<-[:BELONGS_TO_CHAPTER]-(l:Lesson)
-                RETURN l, c.name as chapter_name
-                ORDER BY c.order, l.order
-            """)
-        
-        lessons = []
-        for record in result:
-            lesson = dict(record["l"].items())
-            lesson['chapter_name'] = record['chapter_name']
-            lessons.append(lesson)
+    if chapter_id:
+        result = neo4j_api.read_query(Q_LESSONS_BY_CHAPTER, chapter_id=chapter_id)
+    else:
+        result = neo4j_api.read_query(Q_LESSONS)
+    lessons = [record["l"] for record in result]
     
-    return jsonify({'lessons': lessons, 'count': len(lessons), 'success': True})
+    return _json_response({'lessons': lessons, 'count': len(lessons), 'success': True})
 
 # ==================== USERS SECTION ====================
 
 @app.route('/api/v1/users', methods=['GET'])
 @handle_errors
 def get_users():
-    """Get all users"""
-    with neo4j_api.driver.session() as session:
-        result = session.run("MATCH (u:User) RETURN u ORDER BY u.name")
-        users = [dict(record["u"].items()) for record in result]
+    """Get users, one page at a time"""
+    try:
+        limit, offset = page_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor', 'success': False}), 400
     
-    return jsonify({'users': users, 'count': len(users), 'success': True})
+    with neo4j_api.read_session() as session:
+        # Fetch one extra row to know whether another page exists
+        result = session.run(Q_USERS, offset=offset, limit=limit + 1)
+        users, next_cursor = page_result([record["u"] for record in result], limit, offset)
+    
+    return jsonify({'users': users, 'count': len(users), 'next_cursor': next_cursor, 'success': True})
 
 @app.route('/api/v1/users', methods=['POST'])
 @handle_errors
@@ -196,31 +641,32 @@ def create_user():
     if not all(field in data for field in ['name', 'email']):
         return jsonify({'error': 'name and email required', 'success': False}), 400
     
-    with neo4j_api.driver.session() as session:
-        # Check if email exists
-        existing = session.run("MATCH (u:User {email: $email}) RETURN u", email=data['email'])
-        if existing.single():
-            return jsonify({'error': 'Email already exists', 'success': False}), 409
-        
-        # Create user
-        user_data = {
-            'id': str(uuid.uuid4()),
-            'name': data['name'],
-            'email': data['email'],
-            'age': data.get('age', 7),
-            'createdAt': datetime.now().isoformat(),
-            'updatedAt': datetime.now().isoformat()
-        }
-        
+    now = datetime.now().isoformat()
+    user_data = {
+        'id': str(uuid.uuid4()),
+        'name': data['name'],
+        'email': data['email'],
+        'age': data.get('age', 7),
+        'createdAt': now,
+        'updatedAt': now
+    }
+    
+    with neo4j_api.write_session() as session:
+        # Single round-trip: MERGE on the unique email, only set fields when the node is new
         result = session.run("""
-            CREATE (u:User {
-                id: $id, name: $name, email: $email, age: $age, 
-                createdAt: $createdAt, updatedAt: $updatedAt
-            })
-            RETURN u
+            MERGE (u:User {email: $email})
+              ON CREATE SET u.id = $id, u.name = $name, u.age = $age,
+                            u.createdAt = $createdAt, u.updatedAt = $updatedAt
+            RETURN u, u.id = $id AS created
         """, user_data)
         
-        created_user = dict(result.single()["u"].items())
+        record = result.single()
+        if not record['created']:
+            return jsonify({'error': 'Email already exists', 'success': False}), 409
+        
+        created_user = _props(record["u"])
+    
+    invalidate_cache()
     
     return jsonify({'message': 'User created', 'user': created_user, 'success': True}), 201
 
@@ -240,11 +686,12 @@ def import_users_optimized():
     created_users = []
     errors = []
     
-    with neo4j_api.driver.session() as session:
+    with neo4j_api.write_session() as session:
         with session.begin_transaction() as tx:
             try:
-                # Validate all users first
+                # Validate all users first; one timestamp for the whole request
                 valid_users = []
+                now = datetime.now().isoformat()
                 for i, user in enumerate(users_data):
                     if not all(field in user for field in ['name', 'email']):
                         errors.append(f'User {i}: Missing name or email')
@@ -260,51 +707,34 @@ def import_users_optimized():
                         'name': user['name'].strip(),
                         'email': user['email'].strip().lower(),
                         'age': user.get('age', 7),
-                        'createdAt': datetime.now().isoformat(),
-                        'updatedAt': datetime.now().isoformat()
+                        'createdAt': now,
+                        'updatedAt': now
                     }
                     valid_users.append(user_data)
                 
                 if not valid_users:
                     return jsonify({'error': 'No valid users to import', 'errors': errors, 'success': False}), 400
                 
-                # Check for existing emails in batch
-                existing_emails = []
-                if valid_users:
-                    email_list = [user['email'] for user in valid_users]
-                    existing_result = tx.run("""
-                        MATCH (u:User) 
-                        WHERE u.email IN $email_list 
-                        RETURN u.email as email
-                    """, email_list=email_list)
-                    existing_emails = [record['email'] for record in existing_result]
-                
-                # Filter out existing emails
-                new_users = []
-                for user in valid_users:
-                    if user['email'] in existing_emails:
-                        errors.append(f'Email {user["email"]} already exists')
-                    else:
-                        new_users.append(user)
-                
-                # Bulk create users in batches
-                for i in range(0, len(new_users), batch_size):
-                    batch = new_users[i:i + batch_size]
+                # Bulk create users in batches; MERGE on the unique email skips existing ones
+                for i in range(0, len(valid_users), batch_size):
+                    batch = valid_users[i:i + batch_size]
                     
-                    # Single query to create multiple users
                     result = tx.run("""
                         UNWIND $users as user
-                        CREATE (u:User {
-                            id: user.id, name: user.name, email: user.email, 
-                            age: user.age, createdAt: user.createdAt, updatedAt: user.updatedAt
-                        })
-                        RETURN u
+                        MERGE (u:User {email: user.email})
+                          ON CREATE SET u.id = user.id, u.name = user.name, u.age = user.age,
+                                        u.createdAt = user.createdAt, u.updatedAt = user.updatedAt
+                        RETURN u, u.id = user.id AS created
                     """, users=batch)
                     
-                    batch_created = [dict(record["u"].items()) for record in result]
-                    created_users.extend(batch_created)
+                    for record in result:
+                        if record['created']:
+                            created_users.append(_props(record["u"]))
+                        else:
+                            errors.append(f'Email {record["u"]["email"]} already exists')
                 
                 tx.commit()
+                invalidate_cache()
                 
             except Exception as e:
                 tx.rollback()
@@ -331,17 +761,18 @@ def import_questions_optimized():
         return jsonify({'error': 'questions array required', 'success': False}), 400
     
     batch_size = data.get('batch_size', 500)  # Smaller batch for relationships
+    parallel = bool(data.get('parallel', False))
     questions_data = data['questions']
     
     created_questions = []
     errors = []
     
-    with neo4j_api.driver.session() as session:
+    with neo4j_api.write_session() as session:
         with session.begin_transaction() as tx:
             try:
                 # Validate and prepare questions
                 valid_questions = []
-                lesson_ids = set()
+                now = datetime.now().isoformat()
                 
                 for i, question in enumerate(questions_data):
                     required_fields = ['lesson_id', 'title', 'content', 'correct_answer', 'difficulty', 'page']
@@ -360,65 +791,46 @@ def import_questions_optimized():
                         'image_answer': question.get('image_answer', ''),
                         'difficulty': question['difficulty'],
                         'page': question['page'],
-                        'createdAt': datetime.now().isoformat(),
-                        'updatedAt': datetime.now().isoformat()
+                        'createdAt': now,
+                        'updatedAt': now
                     }
                     valid_questions.append(question_data)
-                    lesson_ids.add(question['lesson_id'])
                 
                 if not valid_questions:
                     return jsonify({'error': 'No valid questions to import', 'errors': errors, 'success': False}), 400
                 
-                # Validate all lesson_ids exist in batch
-                existing_lessons = set()
-                if lesson_ids:
-                    lesson_result = tx.run("""
-                        MATCH (l:Lesson) 
-                        WHERE l.id IN $lesson_ids 
-                        RETURN l.id as id
-                    """, lesson_ids=list(lesson_ids))
-                    existing_lessons = {record['id'] for record in lesson_result}
+                # Bulk create questions and relationships in batches;
+                # rows whose lesson does not exist are dropped by the MATCH
+                batches = [valid_questions[i:i + batch_size] for i in range(0, len(valid_questions), batch_size)]
                 
-                # Filter questions with valid lessons
-                final_questions = []
-                for question in valid_questions:
-                    if question['lesson_id'] not in existing_lessons:
-                        errors.append(f'Lesson {question["lesson_id"]} not found for question {question["title"]}')
-                    else:
-                        final_questions.append(question)
+                # Create questions and their lesson relationships in one pass
+                batch_results = write_batches(tx, """
+                    UNWIND $questions as q
+                    MATCH (l:Lesson {id: q.lesson_id})
+                    CREATE (question:Question {
+                        id: q.id, title: q.title, content: q.content, 
+                        correct_answer: q.correct_answer, image_question: q.image_question,
+                        image_answer: q.image_answer, difficulty: q.difficulty, 
+                        page: q.page, createdAt: q.createdAt, updatedAt: q.updatedAt
+                    })-[:BELONGS_TO_LESSON]->(l)
+                    RETURN question
+                """, 'questions', batches, parallel=parallel)
                 
-                # Bulk create questions and relationships in batches
-                for i in range(0, len(final_questions), batch_size):
-                    batch = final_questions[i:i + batch_size]
-                    
-                    # Create questions
-                    question_result = tx.run("""
-                        UNWIND $questions as q
-                        CREATE (question:Question {
-                            id: q.id, title: q.title, content: q.content, 
-                            correct_answer: q.correct_answer, image_question: q.image_question,
-                            image_answer: q.image_answer, difficulty: q.difficulty, 
-                            page: q.page, createdAt: q.createdAt, updatedAt: q.updatedAt
-                        })
-                        RETURN question
-                    """, questions=batch)
-                    
-                    batch_created = [dict(record["question"].items()) for record in question_result]
+                for batch, batch_created in zip(batches, batch_results):
                     created_questions.extend(batch_created)
                     
-                    # Create relationships in batch
-                    relationship_data = [{'question_id': q['id'], 'lesson_id': q['lesson_id']} for q in batch]
-                    tx.run("""
-                        UNWIND $relationships as rel
-                        MATCH (l:Lesson {id: rel.lesson_id})
-                        MATCH (q:Question {id: rel.question_id})
-                        CREATE (q)-[:BELONGS_TO_LESSON]->(l)
-                    """, relationships=relationship_data)
+                    created_ids = {question['id'] for question in batch_created}
+                    for question in batch:
+                        if question['id'] not in created_ids:
+                            errors.append(f'Lesson {question["lesson_id"]} not found for question {question["title"]}')
                 
                 tx.commit()
+                invalidate_cache()
                 
             except Exception as e:
                 tx.rollback()
+                if parallel:
+                    invalidate_cache()  # batches that finished before the failure stay committed
                 return jsonify({'error': f'Transaction failed: {str(e)}', 'success': False}), 500
     
     return jsonify({
@@ -430,7 +842,7 @@ def import_questions_optimized():
         'errors': errors,
         'performance': {
             'batch_size': batch_size,
-            'batches_processed': (len(final_questions) // batch_size) + 1
+            'batches_processed': len(batches)
         },
         'success': len(created_questions) > 0
     }), 201
@@ -446,18 +858,20 @@ def import_answers_optimized():
         return jsonify({'error': 'answers array required', 'success': False}), 400
     
     batch_size = data.get('batch_size', 500)
+    parallel = bool(data.get('parallel', False))
     answers_data = data['answers']
     
     created_answers = []
     errors = []
     
-    with neo4j_api.driver.session() as session:
+    with neo4j_api.write_session() as session:
         with session.begin_transaction() as tx:
             try:
                 # Validate and prepare answers
                 valid_answers = []
                 user_ids = set()
                 question_ids = set()
+                now = datetime.now().isoformat()
                 
                 for i, answer in enumerate(answers_data):
                     required_fields = ['user_id', 'question_id', 'student_answer', 'is_correct']
@@ -466,7 +880,6 @@ def import_answers_optimized():
                         errors.append(f'Answer {i}: Missing {missing_fields}')
                         continue
                     
-                    now = datetime.now().isoformat()
                     answer_data = {
                         'id': str(uuid.uuid4()),
                         'user_id': answer['user_id'],
@@ -486,17 +899,12 @@ def import_answers_optimized():
                 if not valid_answers:
                     return jsonify({'error': 'No valid answers to import', 'errors': errors, 'success': False}), 400
                 
-                # Validate all user_ids and question_ids exist
-                existing_users = set()
-                existing_questions = set()
+                # Validate all user_ids and question_ids exist (both sets are non-empty here)
+                user_result = tx.run("MATCH (u:User) WHERE u.id IN $user_ids RETURN u.id as id", user_ids=list(user_ids))
+                existing_users = {record['id'] for record in user_result}
                 
-                if user_ids:
-                    user_result = tx.run("MATCH (u:User) WHERE u.id IN $user_ids RETURN u.id as id", user_ids=list(user_ids))
-                    existing_users = {record['id'] for record in user_result}
-                
-                if question_ids:
-                    question_result = tx.run("MATCH (q:Question) WHERE q.id IN $question_ids RETURN q.id as id", question_ids=list(question_ids))
-                    existing_questions = {record['id'] for record in question_result}
+                question_result = tx.run("MATCH (q:Question) WHERE q.id IN $question_ids RETURN q.id as id", question_ids=list(question_ids))
+                existing_questions = {record['id'] for record in question_result}
                 
                 # Filter answers with valid users and questions
                 final_answers = []
@@ -510,46 +918,32 @@ def import_answers_optimized():
                     final_answers.append(answer)
                 
                 # Bulk create answers and relationships
-                for i in range(0, len(final_answers), batch_size):
-                    batch = final_answers[i:i + batch_size]
-                    
-                    # Create answers
-                    answer_result = tx.run("""
-                        UNWIND $answers as a
-                        CREATE (answer:Answer {
-                            id: a.id, student_answer: a.student_answer, is_correct: a.is_correct,
-                            start_time: a.start_time, completion_time: a.completion_time,
-                            duration_seconds: a.duration_seconds, 
-                            createdAt: a.createdAt, updatedAt: a.updatedAt
-                        })
-                        RETURN answer
-                    """, answers=batch)
-                    
-                    batch_created = [dict(record["answer"].items()) for record in answer_result]
+                batches = [final_answers[i:i + batch_size] for i in range(0, len(final_answers), batch_size)]
+                
+                # Create answers together with both relationships in one pass
+                batch_results = write_batches(tx, """
+                    UNWIND $answers as a
+                    MATCH (u:User {id: a.user_id})
+                    MATCH (q:Question {id: a.question_id})
+                    CREATE (u)-[:ANSWERED]->(answer:Answer {
+                        id: a.id, student_answer: a.student_answer, is_correct: a.is_correct,
+                        start_time: a.start_time, completion_time: a.completion_time,
+                        duration_seconds: a.duration_seconds, 
+                        createdAt: a.createdAt, updatedAt: a.updatedAt
+                    })-[:ANSWERS_QUESTION]->(q)
+                    RETURN answer
+                """, 'answers', batches, parallel=parallel)
+                
+                for batch_created in batch_results:
                     created_answers.extend(batch_created)
-                    
-                    # Create User-[:ANSWERED]->Answer relationships
-                    user_relationships = [{'answer_id': a['id'], 'user_id': a['user_id']} for a in batch]
-                    tx.run("""
-                        UNWIND $relationships as rel
-                        MATCH (u:User {id: rel.user_id})
-                        MATCH (a:Answer {id: rel.answer_id})
-                        CREATE (u)-[:ANSWERED]->(a)
-                    """, relationships=user_relationships)
-                    
-                    # Create Answer-[:ANSWERS_QUESTION]->Question relationships
-                    question_relationships = [{'answer_id': a['id'], 'question_id': a['question_id']} for a in batch]
-                    tx.run("""
-                        UNWIND $relationships as rel
-                        MATCH (q:Question {id: rel.question_id})
-                        MATCH (a:Answer {id: rel.answer_id})
-                        CREATE (a)-[:ANSWERS_QUESTION]->(q)
-                    """, relationships=question_relationships)
                 
                 tx.commit()
+                invalidate_cache()
                 
             except Exception as e:
                 tx.rollback()
+                if parallel:
+                    invalidate_cache()  # batches that finished before the failure stay committed
                 return jsonify({'error': f'Transaction failed: {str(e)}', 'success': False}), 500
     
     return jsonify({
@@ -561,255 +955,268 @@ def import_answers_optimized():
         'errors': errors,
         'performance': {
             'batch_size': batch_size,
-            'batches_processed': (len(final_answers) // batch_size) + 1
+            'batches_processed': len(batches)
         },
         'success': len(created_answers) > 0
     }), 201
 
 @app.route('/api/v1/questions', methods=['GET'])
 @handle_errors
+@cached_route()
 def get_questions():
-    """Get all questions with full hierarchy"""
+    """Get questions with full hierarchy, one page at a time"""
     lesson_id = request.args.get('lesson_id')
     chapter_id = request.args.get('chapter_id')
+    try:
+        limit, offset = page_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor', 'success': False}), 400
     
-    with neo4j_api.driver.session() as session:
+    with neo4j_api.read_session() as session:
+        # lesson_id wins over chapter_id when both are given
         if lesson_id:
-            result = session.run("""
-                MATCH (q:Question)-[:BELONGS_TO_LESSON]->(l:Lesson {id: $lesson_id})
-                MATCH (l)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
-                MATCH (c)-[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)
-                MATCH (t)-[:BELONGS_TO_SUBJECT]->(s:Subject)
-                RETURN q, l.name as lesson_name, c.name as chapter_name, 
-                       t.name as typebook_name, s.name as subject_name
-                ORDER BY q.page
-            """, lesson_id=lesson_id)
+            result = session.run(Q_QUESTIONS_BY_LESSON, lesson_id=lesson_id, offset=offset, limit=limit + 1)
         elif chapter_id:
-            result = session.run("""
-                MATCH (q:Question)-[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter {id: $chapter_id})
-                MATCH (c)-[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)
-                MATCH (t)-[:BELONGS_TO_SUBJECT]->(s:Subject)
-                RETURN q, l.name as lesson_name, c.name as chapter_name, 
-                       t.name as typebook_name, s.name as subject_name
-                ORDER BY l.order, q.page
-            """, chapter_id=chapter_id)
+            result = session.run(Q_QUESTIONS_BY_CHAPTER, chapter_id=chapter_id, offset=offset, limit=limit + 1)
         else:
-            result = session.run("""
-                MATCH (q:Question)-[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
-                MATCH (c)-[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)
-                MATCH (t)-[:BELONGS_TO_SUBJECT]->(s:Subject)
-                RETURN q, l.name as lesson_name, c.name as chapter_name, 
-                       t.name as typebook_name, s.name as subject_name
-                ORDER BY s.name, t.name, c.order, l.order, q.page
-            """)
-        
-        questions = []
-        for record in result:
-            question = dict(record["q"].items())
-            question['lesson_name'] = record['lesson_name']
-            question['chapter_name'] = record['chapter_name']
-            question['typebook_name'] = record['typebook_name']
-            question['subject_name'] = record['subject_name']
-            questions.append(question)
-    
-    return jsonify({'questions': questions, 'count': len(questions), 'success': True})
+            result = session.run(Q_QUESTIONS, offset=offset, limit=limit + 1)
+        questions, next_cursor = page_result([record["q"] for record in result], limit, offset)
+    
+    return _json_response({'questions': questions, 'count': len(questions), 'next_cursor': next_cursor, 'success': True})
 # ==================== EXPORT DATA ====================
 
+# Rows the next export section may fetch ahead of the one being streamed
+EXPORT_PREFETCH_ROWS = 1000
+_SECTION_END = object()
+
+class _SectionPrefetcher:
+    """Runs one export query on the read pool, buffering at most `maxsize` encoded rows ahead of the consumer"""
+    
+    def __init__(self, query, maxsize=EXPORT_PREFETCH_ROWS):
+        self._queue = queue.Queue(maxsize)
+        self._stop = threading.Event()
+        self._head = None
+        _query_executor.submit(self._run, query)
+    
+    def _run(self, query):
+        try:
+            with neo4j_api.read_session() as session:
+                for record in session.run(query):
+                    if not self._put(_dumps(record[0])):
+                        return
+        except Exception as e:
+            self._put(e)
+            return
+        self._put(_SECTION_END)
+    
+    def _put(self, item):
+        # Poll so an abandoned export (client gone) releases the worker thread
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def wait(self):
+        """Block until the first row (or the end) arrives, raising the query's error in the caller"""
+        item = self._queue.get()
+        if isinstance(item, Exception):
+            raise item
+        self._head = item
+    
+    def __iter__(self):
+        item, self._head = self._head, None
+        while True:
+            if item is None:
+                item = self._queue.get()
+            if item is _SECTION_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            item = None
+    
+    def cancel(self):
+        self._stop.set()
+
 @app.route('/api/v1/export', methods=['GET'])
 @handle_errors
 def export_data():
-    """Export all data with full hierarchy"""
-    with neo4j_api.driver.session() as session:
-        # Get users
-        users_result = session.run("MATCH (u:User) RETURN u")
-        users = [dict(record["u"].items()) for record in users_result]
-        
-        # Get questions with full hierarchy
-        questions_result = session.run("""
-            MATCH (q:Question)-[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
-            MATCH (c)-[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)
-            MATCH (t)-[:BELONGS_TO_SUBJECT]->(s:Subject)
-            RETURN q, l.name as lesson_name, c.name as chapter_name, 
-                   t.name as typebook_name, s.name as subject_name
-        """)
-        
-        questions = []
-        for record in questions_result:
-            question = dict(record["q"].items())
-            question['lesson_name'] = record['lesson_name']
-            question['chapter_name'] = record['chapter_name']
-            question['typebook_name'] = record['typebook_name']
-            question['subject_name'] = record['subject_name']
-            questions.append(question)
-        
-        # Get answers with full context
-        answers_result = session.run("""
-            MATCH (u:User)-[:ANSWERED]->(a:Answer)-[:ANSWERS_QUESTION]->(q:Question)
-            MATCH (q)-[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
-            RETURN a, u.id as user_id, q.id as question_id,
-                   u.name as student_name, q.title as question_title,
-                   l.name as lesson_name, c.name as chapter_name
-        """)
+    """Export all data with full hierarchy, streaming rows while the next section is fetched"""
+    if request.args.get('format') == 'ndjson':
+        return export_ndjson()
+    
+    sections = [('users', Q_EXPORT_USERS), ('questions', Q_EXPORT_QUESTIONS), ('answers', Q_EXPORT_ANSWERS)]
+    
+    # The first query runs before the response starts, so connection and query errors still get a 500
+    prefetchers = [_SectionPrefetcher(sections[0][1])]
+    prefetchers[0].wait()
+    
+    def generate():
+        # Each section is streamed as it arrives; only the following section runs ahead,
+        # bounded by EXPORT_PREFETCH_ROWS, so memory stays flat while the queries overlap
+        summary = {}
+        try:
+            for index, (name, _) in enumerate(sections):
+                yield (b'{"' if index == 0 else b'],"') + name.encode() + b'":['
+                if index + 1 < len(sections):
+                    prefetchers.append(_SectionPrefetcher(sections[index + 1][1]))
+                
+                count = 0
+                for row in prefetchers[index]:
+                    yield (b',' if count else b'') + row
+                    count += 1
+                summary[f'total_{name}'] = count
+        except Exception as e:
+            # The 200 is already sent: close the open section and mark the body as failed
+            logger.error(f"Error in export_data: {str(e)}")
+            yield b'],"summary":' + _dumps(summary) + b',"error":' + _dumps(str(e)) + b',"success":false}'
+            return
         
-        answers = []
-        for record in answers_result:
-            answer = dict(record["a"].items())
-            answer['user_id'] = record['user_id']
-            answer['question_id'] = record['question_id']
-            answer['student_name'] = record['student_name']
-            answer['question_title'] = record['question_title']
-            answer['lesson_name'] = record['lesson_name']
-            answer['chapter_name'] = record['chapter_name']
-            answers.append(answer)
+        yield b'],"summary":' + _dumps(summary) + b',"success":true}'
     
-    return jsonify({
-        'users': users,
-        'questions': questions,
-        'answers': answers,
-        'summary': {
-            'total_users': len(users),
-            'total_questions': len(questions),
-            'total_answers': len(answers)
-        },
-        'success': True
-    })
+    def cancel_prefetchers():
+        for prefetcher in prefetchers:
+            prefetcher.cancel()
+    
+    response = Response(stream_with_context(generate()), mimetype='application/json')
+    response.call_on_close(cancel_prefetchers)
+    return response
+
+def export_ndjson():
+    """Stream the export one JSON line per item, without holding any section in memory"""
+    sections = [('user', Q_EXPORT_USERS), ('question', Q_EXPORT_QUESTIONS), ('answer', Q_EXPORT_ANSWERS)]
+    
+    # Fetch the first row before responding, so connection and query errors still get a 500
+    session = neo4j_api.read_session()
+    try:
+        first_result = session.run(sections[0][1])
+        first_result.peek()
+    except Exception:
+        session.close()
+        raise
+    
+    def generate():
+        # The last line is always {"type": "status", ...}; a stream without it was cut off
+        summary = {}
+        try:
+            for index, (item_type, query) in enumerate(sections):
+                count = 0
+                for record in session.run(query) if index else first_result:
+                    yield _dumps({'type': item_type, 'data': record[0]}) + b'\n'
+                    count += 1
+                summary[f'total_{item_type}s'] = count
+        except Exception as e:
+            logger.error(f"Error in export_ndjson: {str(e)}")
+            yield _dumps({'type': 'status', 'summary': summary, 'error': str(e), 'success': False}) + b'\n'
+            return
+        yield _dumps({'type': 'status', 'summary': summary, 'success': True}) + b'\n'
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(session.close)
+    return response
 
 # ==================== TREE STRUCTURE API ====================
 
 @app.route('/api/v1/tree', methods=['GET'])
 @handle_errors
+@cached_route()
 def get_tree_structure():
     """Get complete tree structure with all IDs"""
     include_users = request.args.get('include_users', 'true').lower() == 'true'
     include_questions = request.args.get('include_questions', 'true').lower() == 'true'
     
-    with neo4j_api.driver.session() as session:
-        # Get hierarchy structure
-        hierarchy_query = """
-        MATCH (s:Subject)<-[:BELONGS_TO_SUBJECT]-(t:TypeBook)<-[:BELONGS_TO_TYPE_BOOK]-(c:Chapter)<-[:BELONGS_TO_CHAPTER]-(l:Lesson)
-        OPTIONAL MATCH (l)<-[:BELONGS_TO_LESSON]-(q:Question)
-        RETURN s.id as subject_id, s.name as subject_name,
-               t.id as typebook_id, t.name as typebook_name,
-               c.id as chapter_id, c.name as chapter_name, c.order as chapter_order,
-               l.id as lesson_id, l.name as lesson_name, l.order as lesson_order,
-               collect({id: q.id, title: q.title, page: q.page}) as questions
-        ORDER BY s.name, t.name, c.order, l.order
-        """
-        
-        hierarchy_result = session.run(hierarchy_query)
-        
-        # Build tree structure
-        tree = {}
-        
-        for record in hierarchy_result:
-            subject_id = record['subject_id']
-            typebook_id = record['typebook_id']
-            chapter_id = record['chapter_id']
-            lesson_id = record['lesson_id']
-            
-            # Initialize subject if not exists
-            if subject_id not in tree:
-                tree[subject_id] = {
-                    'id': subject_id,
-                    'name': record['subject_name'],
-                    'type': 'subject',
-                    'typebooks': {}
-                }
+    def generate():
+        # Subjects and users are encoded as their rows arrive, so only the encoded body is held
+        with neo4j_api.read_session() as session:
+            total_subjects = 0
+            yield b'{"tree_structure":['
+            for record in session.run(Q_TREE_HIERARCHY, include_questions=include_questions):
+                yield (b',' if total_subjects else b'') + _dumps(record['subject'])
+                total_subjects += 1
             
-            # Initialize typebook if not exists
-            if typebook_id not in tree[subject_id]['typebooks']:
-                tree[subject_id]['typebooks'][typebook_id] = {
-                    'id': typebook_id,
-                    'name': record['typebook_name'],
-                    'type': 'typebook',
-                    'chapters': {}
-                }
-            
-            # Initialize chapter if not exists
-            if chapter_id not in tree[subject_id]['typebooks'][typebook_id]['chapters']:
-                tree[subject_id]['typebooks'][typebook_id]['chapters'][chapter_id] = {
-                    'id': chapter_id,
-                    'name': record['chapter_name'],
-                    'order': record['chapter_order'],
-                    'type': 'chapter',
-                    'lessons': {}
-                }
-            
-            # Add lesson
-            tree[subject_id]['typebooks'][typebook_id]['chapters'][chapter_id]['lessons'][lesson_id] = {
-                'id': lesson_id,
-                'name': record['lesson_name'],
-                'order': record['lesson_order'],
-                'type': 'lesson'
-            }
-            
-            # Add questions if requested
-            if include_questions:
-                questions = [q for q in record['questions'] if q['id'] is not None]
-                tree[subject_id]['typebooks'][typebook_id]['chapters'][chapter_id]['lessons'][lesson_id]['questions'] = questions
-        
-        # Convert nested dicts to arrays for cleaner JSON
-        clean_tree = []
-        for subject in tree.values():
-            subject['typebooks'] = list(subject['typebooks'].values())
-            for typebook in subject['typebooks']:
-                typebook['chapters'] = list(typebook['chapters'].values())
-                for chapter in typebook['chapters']:
-                    chapter['lessons'] = list(chapter['lessons'].values())
-            clean_tree.append(subject)
-        
-        # Get users if requested
-        users = []
-        if include_users:
-            users_result = session.run("MATCH (u:User) RETURN u.id as id, u.name as name, u.email as email ORDER BY u.name")
-            users = [dict(record) for record in users_result]
-        
-        return jsonify({
-            'tree_structure': clean_tree,
-            'users': users if include_users else [],
-            'summary': {
-                'total_subjects': len(clean_tree),
-                'total_users': len(users) if include_users else 0,
-                'include_users': include_users,
-                'include_questions': include_questions
-            },
-            'success': True
-        })
+            # Get users if requested
+            total_users = 0
+            yield b'],"users":['
+            if include_users:
+                for record in session.run(Q_TREE_USERS):
+                    yield (b',' if total_users else b'') + _dumps(dict(record))
+                    total_users += 1
+        
+        summary = {
+            'total_subjects': total_subjects,
+            'total_users': total_users,
+            'include_users': include_users,
+            'include_questions': include_questions
+        }
+        yield b'],"summary":' + _dumps(summary) + b',"success":true}'
+    
+    # Built in full once per cache TTL; cache hits are served straight from the stored bytes
+    return Response(b''.join(generate()), mimetype='application/json')
+
 # ==================== USER-KNOWLEDGE RELATIONSHIP API ====================
 
+KNOWLEDGE_REQUIRED_FIELDS = ('name', 'subject', 'grade')
+_ALLOWED_STATUSES = frozenset({'learning', 'completed', 'mastered', 'reviewing'})
+
+# Progress bucket names, indexed by the bucket number computed in the analytics query
+PROGRESS_LABELS = (
+    'Not Started',
+    'Beginner (1-24%)',
+    'Intermediate (25-49%)',
+    'Advanced (50-74%)',
+    'Near Complete (75-99%)',
+    'Completed (100%)'
+)
+
 @app.route('/api/v1/knowledge', methods=['GET'])
 @handle_errors
+@cached_route(ttl=60)
 def get_knowledge():
-    """Get all knowledge nodes"""
+    """Get knowledge nodes, one page at a time (keyset on order, id)"""
     subject = request.args.get('subject')
     grade = request.args.get('grade')
+    try:
+        limit, last_key = keyset_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor', 'success': False}), 400
     
-    with neo4j_api.driver.session() as session:
-        # Build query with optional filters
-        query = "MATCH (k:Knowledge)"
-        conditions = []
-        params = {}
-        
-        if subject:
-            conditions.append("k.subject = $subject")
-            params['subject'] = subject
-        
-        if grade:
-            conditions.append("k.grade = $grade")
-            params['grade'] = grade
-        
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " RETURN k ORDER BY k.order"
-        
-        result = session.run(query, params)
-        knowledge_list = [dict(record["k"].items()) for record in result]
+    # Build query with optional filters
+    query = "MATCH (k:Knowledge)"
+    conditions = []
+    params = {'limit': limit + 1}
     
-    return jsonify({
+    if subject:
+        conditions.append("k.subject = $subject")
+        params['subject'] = subject
+    
+    if grade:
+        conditions.append("k.grade = $grade")
+        params['grade'] = grade
+    
+    if last_key:
+        conditions.append("(k.order > $after_order OR (k.order = $after_order AND k.id > $after_id))")
+        params['after_order'], params['after_id'] = last_key
+    
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    
+    query += " RETURN k{.*} as k ORDER BY k.order, k.id LIMIT $limit"
+    
+    knowledge_list = [record["k"] for record in query_read(query, params)]
+    
+    next_cursor = None
+    if len(knowledge_list) > limit:
+        knowledge_list = knowledge_list[:limit]
+        next_cursor = keyset_cursor([knowledge_list[-1].get('order'), knowledge_list[-1]['id']])
+    
+    return _json_response({
         'knowledge': knowledge_list, 
         'count': len(knowledge_list), 
         'filters': {'subject': subject, 'grade': grade},
+        'next_cursor': next_cursor,
         'success': True
     })
 
@@ -820,33 +1227,32 @@ def create_knowledge():
     """Create new knowledge node"""
     data = request.get_json()
     
-    required_fields = ['name', 'subject', 'grade']
-    if not all(field in data for field in required_fields):
-        return jsonify({'error': f'Required fields: {required_fields}', 'success': False}), 400
+    if not all(field in data for field in KNOWLEDGE_REQUIRED_FIELDS):
+        return jsonify({'error': f'Required fields: {list(KNOWLEDGE_REQUIRED_FIELDS)}', 'success': False}), 400
+    
+    # Create knowledge
+    now = datetime.now().isoformat()
+    knowledge_data = {
+        'id': str(uuid.uuid4()),
+        'name': data['name'],
+        'description': data.get('description', f"Kiến thức về: {data['name']}"),
+        'order': data.get('order', 1),
+        'subject': data['subject'],
+        'grade': data['grade'],
+        'createdAt': now,
+        'updatedAt': now
+    }
     
-    with neo4j_api.driver.session() as session:
-        # Check if knowledge with same name already exists
-        existing = session.run("""
+    def create_tx(tx):
+        # Duplicate check and create share one transaction, so a retry repeats both
+        existing = tx.run("""
             MATCH (k:Knowledge {name: $name, subject: $subject, grade: $grade}) 
-            RETURN k
+            RETURN k LIMIT 1
         """, name=data['name'], subject=data['subject'], grade=data['grade'])
-        
         if existing.single():
-            return jsonify({'error': 'Knowledge with same name, subject and grade already exists', 'success': False}), 409
-        
-        # Create knowledge
-        knowledge_data = {
-            'id': str(uuid.uuid4()),
-            'name': data['name'],
-            'description': data.get('description', f"Kiến thức về: {data['name']}"),
-            'order': data.get('order', 1),
-            'subject': data['subject'],
-            'grade': data['grade'],
-            'createdAt': datetime.now().isoformat(),
-            'updatedAt': datetime.now().isoformat()
-        }
+            return None
         
-        result = session.run("""
+        result = tx.run("""
             CREATE (k:Knowledge {
                 id: $id, name: $name, description: $description, order: $order,
                 subject: $subject, grade: $grade, 
@@ -854,9 +1260,13 @@ def create_knowledge():
             })
             RETURN k
         """, knowledge_data)
-        
-        created_knowledge = dict(result.single()["k"].items())
+        return _props(result.single()["k"])
     
+    created_knowledge = request_session().execute_write(create_tx)
+    if created_knowledge is None:
+        return jsonify({'error': 'Knowledge with same name, subject and grade already exists', 'success': False}), 409
+    
+    invalidate_cache()
     return jsonify({
         'message': 'Knowledge created successfully', 
         'knowledge': created_knowledge, 
@@ -867,46 +1277,38 @@ def create_knowledge():
 @handle_errors
 def link_user_knowledge(user_id, knowledge_id):
     """Link user to knowledge with timestamp"""
-    with neo4j_api.driver.session() as session:
-        # Check if user exists
-        user_check = session.run("MATCH (u:User {id: $user_id}) RETURN u", user_id=user_id)
-        if not user_check.single():
-            return jsonify({'error': 'User not found', 'success': False}), 404
-        
-        # Check if knowledge exists  
-        knowledge_check = session.run("MATCH (k:Knowledge {id: $knowledge_id}) RETURN k", knowledge_id=knowledge_id)
-        knowledge_record = knowledge_check.single()
-        if not knowledge_record:
-            return jsonify({'error': 'Knowledge not found', 'success': False}), 404
-        
-        knowledge = dict(knowledge_record["k"].items())
-        
-        # Check if relationship already exists
-        existing_rel = session.run("""
-            MATCH (u:User {id: $user_id})-[r:LEARNED]->(k:Knowledge {id: $knowledge_id})
-            RETURN r
-        """, user_id=user_id, knowledge_id=knowledge_id)
-        
-        if existing_rel.single():
-            return jsonify({'error': 'User already linked to this knowledge', 'success': False}), 409
-        
-        # Create relationship with timestamp
-        now = datetime.now().isoformat()
-        result = session.run("""
-            MATCH (u:User {id: $user_id})
-            MATCH (k:Knowledge {id: $knowledge_id})
-            CREATE (u)-[r:LEARNED {
+    # Existence checks, duplicate check and create in a single round-trip
+    now = datetime.now().isoformat()
+    link_result = query_write("""
+        OPTIONAL MATCH (u:User {id: $user_id})
+        OPTIONAL MATCH (k:Knowledge {id: $knowledge_id})
+        OPTIONAL MATCH (u)-[existing:LEARNED]->(k)
+        WITH u, k, count(existing) > 0 as existed
+        FOREACH (_ IN CASE WHEN u IS NOT NULL AND k IS NOT NULL AND NOT existed THEN [1] ELSE [] END |
+            CREATE (u)-[:LEARNED {
                 linkedAt: $linkedAt,
                 status: 'learning',
                 progress: 0,
                 createdAt: $linkedAt,
                 updatedAt: $linkedAt
             }]->(k)
-            RETURN u.name as user_name, k.name as knowledge_name, r
-        """, user_id=user_id, knowledge_id=knowledge_id, linkedAt=now)
-        
-        link_result = result.single()
-        relationship = dict(link_result["r"].items())
+        )
+        WITH u, k, existed
+        OPTIONAL MATCH (u)-[r:LEARNED]->(k)
+        WITH u, k, existed, head(collect(r)) as r
+        RETURN u IS NOT NULL as user_found, k{.*} as knowledge, existed,
+               u.name as user_name, k.name as knowledge_name, r{.*} as relationship
+    """, user_id=user_id, knowledge_id=knowledge_id, linkedAt=now)[0]
+    
+    if not link_result['user_found']:
+        return jsonify({'error': 'User not found', 'success': False}), 404
+    if link_result['knowledge'] is None:
+        return jsonify({'error': 'Knowledge not found', 'success': False}), 404
+    if link_result['existed']:
+        return jsonify({'error': 'User already linked to this knowledge', 'success': False}), 409
+    
+    knowledge = link_result['knowledge']
+    relationship = link_result['relationship']
     
     return jsonify({
         'message': f'User linked to knowledge successfully',
@@ -922,42 +1324,54 @@ def link_user_knowledge(user_id, knowledge_id):
 @app.route('/api/v1/users/<user_id>/knowledge', methods=['GET'])
 @handle_errors
 def get_user_knowledge(user_id):
-    """Get all knowledge linked to a user"""
-    with neo4j_api.driver.session() as session:
-        # Check if user exists
-        user_check = session.run("MATCH (u:User {id: $user_id}) RETURN u", user_id=user_id)
-        user_record = user_check.single()
-        if not user_record:
-            return jsonify({'error': 'User not found', 'success': False}), 404
-        
-        user = dict(user_record["u"].items())
-        
-        # Get all knowledge linked to user
-        result = session.run("""
-            MATCH (u:User {id: $user_id})-[r:LEARNED]->(k:Knowledge)
-            RETURN k, r, 
-                   substring(r.linkedAt, 0, 10) as linked_date,
-                   substring(r.linkedAt, 11, 8) as linked_time
-            ORDER BY r.linkedAt DESC
-        """, user_id=user_id)
+    """Get knowledge linked to a user, newest first, one page at a time"""
+    try:
+        limit, last_key = keyset_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor', 'success': False}), 400
+    after_linked_at, after_id = last_key or (None, None)
+    
+    # Check if user exists
+    user_check = query_read("MATCH (u:User {id: $user_id}) RETURN u", user_id=user_id)
+    if not user_check:
+        return jsonify({'error': 'User not found', 'success': False}), 404
+    
+    user = _props(user_check[0]["u"])
+    
+    # Get the next page of knowledge linked to user (keyset on linkedAt, id)
+    records = query_read("""
+        MATCH (u:User {id: $user_id})-[r:LEARNED]->(k:Knowledge)
+        WHERE $after_linked_at IS NULL
+           OR r.linkedAt < $after_linked_at
+           OR (r.linkedAt = $after_linked_at AND k.id < $after_id)
+        RETURN k, r
+        ORDER BY r.linkedAt DESC, k.id DESC
+        LIMIT $limit
+    """, user_id=user_id, after_linked_at=after_linked_at, after_id=after_id, limit=limit + 1)
+    
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = keyset_cursor([records[-1]['r'].get('linkedAt'), records[-1]['k']['id']])
+    
+    user_knowledge = []
+    for record in records:
+        knowledge = _props(record["k"])
+        relationship = _props(record["r"])
         
-        user_knowledge = []
-        for record in result:
-            knowledge = dict(record["k"].items())
-            relationship = dict(record["r"].items())
-            
-            knowledge_link = {
-                'knowledge': knowledge,
-                'relationship': relationship,
-                'linked_date': record['linked_date'],
-                'linked_time': record['linked_time']
-            }
-            user_knowledge.append(knowledge_link)
+        knowledge_link = {
+            'knowledge': knowledge,
+            'relationship': relationship,
+            'linked_date': relationship.get('linkedAt', '')[:10] or None,
+            'linked_time': relationship.get('linkedAt', '')[11:19] or None
+        }
+        user_knowledge.append(knowledge_link)
     
     return jsonify({
         'user': user,
         'knowledge_list': user_knowledge,
         'total_knowledge': len(user_knowledge),
+        'next_cursor': next_cursor,
         'success': True
     })
 
@@ -965,36 +1379,32 @@ def get_user_knowledge(user_id):
 @handle_errors
 def get_knowledge_users(knowledge_id):
     """Get all users linked to a knowledge"""
-    with neo4j_api.driver.session() as session:
-        # Check if knowledge exists
-        knowledge_check = session.run("MATCH (k:Knowledge {id: $knowledge_id}) RETURN k", knowledge_id=knowledge_id)
-        knowledge_record = knowledge_check.single()
-        if not knowledge_record:
-            return jsonify({'error': 'Knowledge not found', 'success': False}), 404
-        
-        knowledge = dict(knowledge_record["k"].items())
-        
-        # Get all users linked to knowledge
-        result = session.run("""
-            MATCH (u:User)-[r:LEARNED]->(k:Knowledge {id: $knowledge_id})
-            RETURN u, r,
-                   substring(r.linkedAt, 0, 10) as linked_date,
-                   substring(r.linkedAt, 11, 8) as linked_time
-            ORDER BY r.linkedAt DESC
-        """, knowledge_id=knowledge_id)
+    # Check if knowledge exists
+    knowledge_check = query_read("MATCH (k:Knowledge {id: $knowledge_id}) RETURN k", knowledge_id=knowledge_id)
+    if not knowledge_check:
+        return jsonify({'error': 'Knowledge not found', 'success': False}), 404
+    
+    knowledge = _props(knowledge_check[0]["k"])
+    
+    # Get all users linked to knowledge
+    result = query_read("""
+        MATCH (u:User)-[r:LEARNED]->(k:Knowledge {id: $knowledge_id})
+        RETURN u, r
+        ORDER BY r.linkedAt DESC
+    """, knowledge_id=knowledge_id)
+    
+    knowledge_users = []
+    for record in result:
+        user = _props(record["u"])
+        relationship = _props(record["r"])
         
-        knowledge_users = []
-        for record in result:
-            user = dict(record["u"].items())
-            relationship = dict(record["r"].items())
-            
-            user_link = {
-                'user': user,
-                'relationship': relationship,
-                'linked_date': record['linked_date'],
-                'linked_time': record['linked_time']
-            }
-            knowledge_users.append(user_link)
+        user_link = {
+            'user': user,
+            'relationship': relationship,
+            'linked_date': relationship.get('linkedAt', '')[:10] or None,
+            'linked_time': relationship.get('linkedAt', '')[11:19] or None
+        }
+        knowledge_users.append(user_link)
     
     return jsonify({
         'knowledge': knowledge,
@@ -1010,50 +1420,42 @@ def update_user_knowledge_progress(user_id, knowledge_id):
     """Update user's progress on specific knowledge"""
     data = request.get_json()
     
-    with neo4j_api.driver.session() as session:
-        # Check if relationship exists
-        rel_check = session.run("""
-            MATCH (u:User {id: $user_id})-[r:LEARNED]->(k:Knowledge {id: $knowledge_id})
-            RETURN r, u.name as user_name, k.name as knowledge_name
-        """, user_id=user_id, knowledge_id=knowledge_id)
-        
-        rel_record = rel_check.single()
-        if not rel_record:
-            return jsonify({'error': 'User-Knowledge relationship not found', 'success': False}), 404
-        
-        # Update relationship
-        update_data = {
-            'user_id': user_id,
-            'knowledge_id': knowledge_id,
-            'updatedAt': datetime.now().isoformat()
-        }
-        
-        # Add optional updates
-        if 'progress' in data:
-            progress = min(100, max(0, int(data['progress'])))  # Clamp between 0-100
-            update_data['progress'] = progress
-        
-        if 'status' in data:
-            allowed_statuses = ['learning', 'completed', 'mastered', 'reviewing']
-            if data['status'] in allowed_statuses:
-                update_data['status'] = data['status']
-        
-        # Build update query
-        set_clauses = ['r.updatedAt = $updatedAt']
-        if 'progress' in update_data:
-            set_clauses.append('r.progress = $progress')
-        if 'status' in update_data:
-            set_clauses.append('r.status = $status')
-        
-        query = f"""
-        MATCH (u:User {{id: $user_id}})-[r:LEARNED]->(k:Knowledge {{id: $knowledge_id}})
-        SET {', '.join(set_clauses)}
-        RETURN r, u.name as user_name, k.name as knowledge_name
-        """
-        
-        result = session.run(query, update_data)
-        updated_record = result.single()
-        updated_relationship = dict(updated_record["r"].items())
+    # Update relationship
+    update_data = {
+        'user_id': user_id,
+        'knowledge_id': knowledge_id,
+        'updatedAt': datetime.now().isoformat()
+    }
+    
+    # Add optional updates
+    if 'progress' in data:
+        progress = min(100, max(0, int(data['progress'])))  # Clamp between 0-100
+        update_data['progress'] = progress
+    
+    if 'status' in data:
+        if data['status'] in _ALLOWED_STATUSES:
+            update_data['status'] = data['status']
+    
+    # Build update query
+    set_clauses = ['r.updatedAt = $updatedAt']
+    if 'progress' in update_data:
+        set_clauses.append('r.progress = $progress')
+    if 'status' in update_data:
+        set_clauses.append('r.status = $status')
+    
+    query = f"""
+    MATCH (u:User {{id: $user_id}})-[r:LEARNED]->(k:Knowledge {{id: $knowledge_id}})
+    SET {', '.join(set_clauses)}
+    RETURN r, u.name as user_name, k.name as knowledge_name
+    """
+    
+    # The MATCH doubles as the existence check: no row means there is no link to update
+    result = query_write(query, update_data)
+    if not result:
+        return jsonify({'error': 'User-Knowledge relationship not found', 'success': False}), 404
+    
+    updated_record = result[0]
+    updated_relationship = _props(updated_record["r"])
     
     return jsonify({
         'message': 'User knowledge progress updated',
@@ -1069,22 +1471,18 @@ def update_user_knowledge_progress(user_id, knowledge_id):
 @handle_errors
 def unlink_user_knowledge(user_id, knowledge_id):
     """Remove link between user and knowledge"""
-    with neo4j_api.driver.session() as session:
-        # Check if relationship exists and get info
-        rel_check = session.run("""
-            MATCH (u:User {id: $user_id})-[r:LEARNED]->(k:Knowledge {id: $knowledge_id})
-            RETURN r, u.name as user_name, k.name as knowledge_name
-        """, user_id=user_id, knowledge_id=knowledge_id)
-        
-        rel_record = rel_check.single()
-        if not rel_record:
-            return jsonify({'error': 'User-Knowledge relationship not found', 'success': False}), 404
-        
-        # Delete relationship
-        session.run("""
-            MATCH (u:User {id: $user_id})-[r:LEARNED]->(k:Knowledge {id: $knowledge_id})
-            DELETE r
-        """, user_id=user_id, knowledge_id=knowledge_id)
+    # Delete relationship and return its endpoints; no row means it did not exist
+    result = query_write("""
+        MATCH (u:User {id: $user_id})-[r:LEARNED]->(k:Knowledge {id: $knowledge_id})
+        WITH r, u.name as user_name, k.name as knowledge_name
+        DELETE r
+        RETURN user_name, knowledge_name
+    """, user_id=user_id, knowledge_id=knowledge_id)
+    
+    if not result:
+        return jsonify({'error': 'User-Knowledge relationship not found', 'success': False}), 404
+    
+    rel_record = result[0]
     
     return jsonify({
         'message': f'User unlinked from knowledge successfully',
@@ -1109,102 +1507,78 @@ def bulk_link_users_knowledge():
     created_links = []
     errors = []
     
-    with neo4j_api.driver.session() as session:
-        with session.begin_transaction() as tx:
-            try:
-                # Validate and prepare links
-                valid_links = []
-                user_ids = set()
-                knowledge_ids = set()
-                
-                for i, link in enumerate(links_data):
-                    if not all(field in link for field in ['user_id', 'knowledge_id']):
-                        errors.append(f'Link {i}: Missing user_id or knowledge_id')
-                        continue
-                    
-                    link_data = {
-                        'user_id': link['user_id'],
-                        'knowledge_id': link['knowledge_id'],
-                        'status': link.get('status', 'learning'),
-                        'progress': min(100, max(0, link.get('progress', 0))),
-                        'linkedAt': datetime.now().isoformat()
-                    }
-                    link_data['createdAt'] = link_data['linkedAt']
-                    link_data['updatedAt'] = link_data['linkedAt']
-                    
-                    valid_links.append(link_data)
-                    user_ids.add(link['user_id'])
-                    knowledge_ids.add(link['knowledge_id'])
-                
-                if not valid_links:
-                    return jsonify({'error': 'No valid links to create', 'errors': errors, 'success': False}), 400
-                
-                # Validate users and knowledge exist
-                existing_users = set()
-                existing_knowledge = set()
-                
-                if user_ids:
-                    user_result = tx.run("MATCH (u:User) WHERE u.id IN $user_ids RETURN u.id as id", user_ids=list(user_ids))
-                    existing_users = {record['id'] for record in user_result}
-                
-                if knowledge_ids:
-                    knowledge_result = tx.run("MATCH (k:Knowledge) WHERE k.id IN $knowledge_ids RETURN k.id as id", knowledge_ids=list(knowledge_ids))
-                    existing_knowledge = {record['id'] for record in knowledge_result}
-                
-                # Filter valid links
-                final_links = []
-                for link in valid_links:
-                    if link['user_id'] not in existing_users:
-                        errors.append(f'User {link["user_id"]} not found')
-                        continue
-                    if link['knowledge_id'] not in existing_knowledge:
-                        errors.append(f'Knowledge {link["knowledge_id"]} not found')
-                        continue
-                    final_links.append(link)
-                
-                # Check for existing relationships
-                if final_links:
-                    existing_rels = set()
-                    existing_result = tx.run("""
-                        MATCH (u:User)-[r:LEARNED]->(k:Knowledge)
-                        WHERE u.id IN $user_ids AND k.id IN $knowledge_ids
-                        RETURN u.id + '|' + k.id as link_key
-                    """, user_ids=list(user_ids), knowledge_ids=list(knowledge_ids))
-                    existing_rels = {record['link_key'] for record in existing_result}
-                    
-                    # Filter out existing relationships
-                    new_links = []
-                    for link in final_links:
-                        link_key = f"{link['user_id']}|{link['knowledge_id']}"
-                        if link_key in existing_rels:
-                            errors.append(f'User {link["user_id"]} already linked to knowledge {link["knowledge_id"]}')
-                        else:
-                            new_links.append(link)
-                    
-                    final_links = new_links
+    session = request_session()
+    with session.begin_transaction() as tx:
+        try:
+            # Validate and prepare links; one timestamp for the whole request
+            valid_links = []
+            seen_pairs = set()
+            now = datetime.now().isoformat()
+            
+            for i, link in enumerate(links_data):
+                if not all(field in link for field in ['user_id', 'knowledge_id']):
+                    errors.append(f'Link {i}: Missing user_id or knowledge_id')
+                    continue
                 
-                # Bulk create relationships
-                if final_links:
-                    tx.run("""
-                        UNWIND $links as link
-                        MATCH (u:User {id: link.user_id})
-                        MATCH (k:Knowledge {id: link.knowledge_id})
-                        CREATE (u)-[r:LEARNED {
-                            linkedAt: link.linkedAt,
-                            status: link.status,
-                            progress: link.progress,
-                            createdAt: link.createdAt,
-                            updatedAt: link.updatedAt
-                        }]->(k)
-                    """, links=final_links)
-                    
-                    created_links = final_links
+                # The write query checks existing links before creating any, so repeats are dropped here
+                pair = (link['user_id'], link['knowledge_id'])
+                if pair in seen_pairs:
+                    errors.append(f'Link {i}: Duplicate of an earlier link in this request')
+                    continue
+                seen_pairs.add(pair)
                 
-                tx.commit()
+                link_data = {
+                    'user_id': link['user_id'],
+                    'knowledge_id': link['knowledge_id'],
+                    'status': link.get('status', 'learning'),
+                    'progress': min(100, max(0, link.get('progress', 0))),
+                    'linkedAt': now,
+                    'createdAt': now,
+                    'updatedAt': now
+                }
                 
-            except Exception as e:
-                tx.rollback()
-                return jsonify({'error': f'Transaction failed: {str(e)}', 'success': False}), 500
+                valid_links.append(link_data)
+            
+            if not valid_links:
+                return jsonify({'error': 'No valid links to create', 'errors': errors, 'success': False}), 400
+            
+            # Validate, skip existing links and create the rest in one pass over the requested pairs
+            link_result = tx.run("""
+                UNWIND range(0, size($links) - 1) as i
+                WITH i, $links[i] as link
+                OPTIONAL MATCH (u:User {id: link.user_id})
+                OPTIONAL MATCH (k:Knowledge {id: link.knowledge_id})
+                WITH i, link, u, k,
+                     CASE WHEN u IS NULL OR k IS NULL THEN false
+                          ELSE EXISTS { (u)-[:LEARNED]->(k) } END as existed
+                FOREACH (_ IN CASE WHEN u IS NOT NULL AND k IS NOT NULL AND NOT existed THEN [1] ELSE [] END |
+                    CREATE (u)-[:LEARNED {
+                        linkedAt: link.linkedAt,
+                        status: link.status,
+                        progress: link.progress,
+                        createdAt: link.createdAt,
+                        updatedAt: link.updatedAt
+                    }]->(k)
+                )
+                RETURN i, u IS NOT NULL as user_found, k IS NOT NULL as knowledge_found, existed
+            """, links=valid_links)
+            
+            for record in link_result:
+                link = valid_links[record['i']]
+                if not record['user_found']:
+                    errors.append(f'User {link["user_id"]} not found')
+                elif not record['knowledge_found']:
+                    errors.append(f'Knowledge {link["knowledge_id"]} not found')
+                elif record['existed']:
+                    errors.append(f'User {link["user_id"]} already linked to knowledge {link["knowledge_id"]}')
+                else:
+                    created_links.append(link)
+            
+            tx.commit()
+            
+        except Exception as e:
+            tx.rollback()
+            return jsonify({'error': f'Transaction failed: {str(e)}', 'success': False}), 500
     
     return jsonify({
         'message': f'{len(created_links)} user-knowledge links created successfully',
@@ -1218,73 +1592,86 @@ def bulk_link_users_knowledge():
 
 @app.route('/api/v1/users-knowledge/analytics', methods=['GET'])
 @handle_errors
+@cached_route(ttl=30)
 def get_user_knowledge_analytics():
     """Get analytics for user-knowledge relationships"""
-    with neo4j_api.driver.session() as session:
-        # Overall statistics
-        overall_stats = session.run("""
-            MATCH (u:User)-[r:LEARNED]->(k:Knowledge)
-            RETURN count(DISTINCT u) as total_users_learning,
-                   count(DISTINCT k) as total_knowledge_being_learned,
-                   count(r) as total_relationships,
-                   avg(r.progress) as avg_progress
-        """)
-        
-        stats_record = overall_stats.single()
-        overall = dict(stats_record) if stats_record else {}
+    # Traverse LEARNED once; every aggregate below is computed from the collected rows
+    analytics = query_read("""
+        MATCH (u:User)-[r:LEARNED]->(k:Knowledge)
+        WITH collect({u: u, k: k, progress: r.progress, status: r.status, linkedAt: r.linkedAt}) as rows
+        
+        // Overall statistics
+        CALL {
+            WITH rows
+            UNWIND rows as row
+            RETURN {
+                total_users_learning: count(DISTINCT row.u),
+                total_knowledge_being_learned: count(DISTINCT row.k),
+                total_relationships: count(*),
+                avg_progress: avg(row.progress)
+            } as overall
+        }
         
-        # Progress distribution
-        progress_stats = session.run("""
-            MATCH (u:User)-[r:LEARNED]->(k:Knowledge)
+        // Progress distribution
+        CALL {
+            WITH rows
+            UNWIND rows as row
             WITH CASE 
-                WHEN r.progress = 0 THEN 'Not Started'
-                WHEN r.progress < 25 THEN 'Beginner (1-24%)'
-                WHEN r.progress < 50 THEN 'Intermediate (25-49%)'
-                WHEN r.progress < 75 THEN 'Advanced (50-74%)'
-                WHEN r.progress < 100 THEN 'Near Complete (75-99%)'
-                ELSE 'Completed (100%)'
-            END as progress_range
-            RETURN progress_range, count(*) as count
+                WHEN row.progress = 0 THEN 0
+                WHEN row.progress IS NULL OR row.progress >= 100 THEN 5
+                ELSE toInteger(row.progress / 25) + 1
+            END as bucket
+            WITH bucket, count(*) as count
             ORDER BY count DESC
-        """)
-        
-        progress_distribution = {record['progress_range']: record['count'] for record in progress_stats}
+            RETURN collect([bucket, count]) as progress_distribution
+        }
         
-        # Status distribution
-        status_stats = session.run("""
-            MATCH (u:User)-[r:LEARNED]->(k:Knowledge)
-            RETURN r.status as status, count(*) as count
+        // Status distribution
+        CALL {
+            WITH rows
+            UNWIND rows as row
+            WITH row.status as status, count(*) as count
             ORDER BY count DESC
-        """)
-        
-        status_distribution = {record['status']: record['count'] for record in status_stats}
+            RETURN collect([status, count]) as status_distribution
+        }
         
-        # Most popular knowledge
-        popular_knowledge = session.run("""
-            MATCH (u:User)-[r:LEARNED]->(k:Knowledge)
-            RETURN k.name as knowledge_name, k.subject as subject, k.grade as grade,
-                   count(u) as learner_count,
-                   avg(r.progress) as avg_progress
+        // Most popular knowledge
+        CALL {
+            WITH rows
+            UNWIND rows as row
+            WITH row.k.name as knowledge_name, row.k.subject as subject, row.k.grade as grade,
+                 count(row.u) as learner_count,
+                 avg(row.progress) as avg_progress
             ORDER BY learner_count DESC
             LIMIT 10
-        """)
-        
-        popular_list = [dict(record) for record in popular_knowledge]
+            RETURN collect({knowledge_name: knowledge_name, subject: subject, grade: grade,
+                            learner_count: learner_count, avg_progress: avg_progress}) as popular_list
+        }
         
-        # Most active users
-        active_users = session.run("""
-            MATCH (u:User)-[r:LEARNED]->(k:Knowledge)
-            RETURN u.name as user_name, u.email as user_email,
-                   count(k) as knowledge_count,
-                   avg(r.progress) as avg_progress,
-                   max(r.linkedAt) as latest_activity
+        // Most active users
+        CALL {
+            WITH rows
+            UNWIND rows as row
+            WITH row.u.name as user_name, row.u.email as user_email,
+                 count(row.k) as knowledge_count,
+                 avg(row.progress) as avg_progress,
+                 max(row.linkedAt) as latest_activity
             ORDER BY knowledge_count DESC
             LIMIT 10
-        """)
+            RETURN collect({user_name: user_name, user_email: user_email, knowledge_count: knowledge_count,
+                            avg_progress: avg_progress, latest_activity: latest_activity}) as active_list
+        }
         
-        active_list = [dict(record) for record in active_users]
+        RETURN overall, progress_distribution, status_distribution, popular_list, active_list
+    """)[0]
     
-    return jsonify({
+    overall = analytics['overall']
+    progress_distribution = {PROGRESS_LABELS[bucket]: count for bucket, count in analytics['progress_distribution']}
+    status_distribution = dict(analytics['status_distribution'])
+    popular_list = analytics['popular_list']
+    active_list = analytics['active_list']
+    
+    return _json_response({
         'overall_stats': overall,
         'progress_distribution': progress_distribution,
         'status_distribution': status_distribution,
@@ -1298,17 +1685,19 @@ def get_user_knowledge_analytics():
 @handle_errors
 def get_student_detailed_info(user_id):
     """Get detailed information for a single student - NOT statistics"""
-    with neo4j_api.driver.session() as session:
-        # Check user exists
-        user_check = session.run("MATCH (u:User {id: $user_id}) RETURN u", user_id=user_id)
-        user_record = user_check.single()
-        if not user_record:
-            return jsonify({'error': 'Student not found', 'success': False}), 404
-        
-        student = dict(user_record["u"].items())
-        
-        # Get detailed answers with full context
-        detailed_answers = session.run("""
+    def fetch(query):
+        # Each worker thread uses its own session
+        with neo4j_api.read_session() as session:
+            return list(session.run(query, user_id=user_id))
+    
+    # Check the student exists before starting the heavier lookups
+    user_records = query_read("MATCH (u:User {id: $user_id}) RETURN u", user_id=user_id)
+    if not user_records:
+        return jsonify({'error': 'Student not found', 'success': False}), 404
+    
+    # The remaining lookups are independent, so they run concurrently on the shared read pool
+    # Detailed answers with full context
+    answers_future = _query_executor.submit(fetch, """
             MATCH (u:User {id: $user_id})-[:ANSWERED]->(a:Answer)-[:ANSWERS_QUESTION]->(q:Question)
             MATCH (q)-[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
             MATCH (c)-[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)-[:BELONGS_TO_SUBJECT]->(s:Subject)
@@ -1349,12 +1738,10 @@ def get_student_detailed_info(user_id):
                 }
             } as answer_detail
             ORDER BY a.completion_time DESC
-        """, user_id=user_id)
-        
-        answers_list = [record['answer_detail'] for record in detailed_answers] if detailed_answers else []
-        
-        # Get learning progress by subject - FIX: separate queries to avoid nested collect()
-        learning_progress = session.run("""
+        """)
+    
+    # Learning progress by subject - separate query to avoid nested collect()
+    progress_future = _query_executor.submit(fetch, """
             MATCH (u:User {id: $user_id})-[:ANSWERED]->(a:Answer)-[:ANSWERS_QUESTION]->(q:Question)
             MATCH (q)-[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
             MATCH (c)-[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)-[:BELONGS_TO_SUBJECT]->(s:Subject)
@@ -1364,24 +1751,10 @@ def get_student_detailed_info(user_id):
                    max(a.completion_time) as latest_activity,
                    min(a.start_time) as first_activity
             ORDER BY s.name
-        """, user_id=user_id)
-        
-        progress_list = []
-        for record in learning_progress:
-            progress_item = {
-                'subject': {
-                    'id': record['subject_id'],
-                    'name': record['subject_name']
-                },
-                'typebooks': record['typebooks'],
-                'chapters': record['chapters'],
-                'latest_activity': record['latest_activity'],
-                'first_activity': record['first_activity']
-            }
-            progress_list.append(progress_item)
-        
-        # Get recent mistakes for learning improvement
-        recent_mistakes = session.run("""
+        """)
+    
+    # Recent mistakes for learning improvement
+    mistakes_future = _query_executor.submit(fetch, """
             MATCH (u:User {id: $user_id})-[:ANSWERED]->(a:Answer {is_correct: false})-[:ANSWERS_QUESTION]->(q:Question)
             MATCH (q)-[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
             RETURN {
@@ -1401,31 +1774,48 @@ def get_student_detailed_info(user_id):
             } as mistake
             ORDER BY a.completion_time DESC
             LIMIT 10
-        """, user_id=user_id)
-        
-        mistakes_list = [record['mistake'] for record in recent_mistakes] if recent_mistakes else []
-        
-        # Get current study streak - FIX: handle datetime format properly and check for None
-        study_streak = session.run("""
+        """)
+    
+    # Study dates and answer counts in one pass over the student's answers;
+    # substring() of a missing completion_time is null, which collect() skips
+    stats_future = _query_executor.submit(fetch, """
             MATCH (u:User {id: $user_id})-[:ANSWERED]->(a:Answer)
-            WHERE a.completion_time IS NOT NULL
-            WITH DISTINCT substring(a.completion_time, 0, 10) as study_date
-            ORDER BY study_date DESC
-            RETURN collect(study_date) as study_dates
-        """, user_id=user_id)
-        
-        study_streak_result = study_streak.single()
-        study_dates = study_streak_result['study_dates'] if study_streak_result and study_streak_result['study_dates'] else []
+            RETURN count(a) as total_answers,
+                   count(CASE WHEN a.is_correct THEN 1 END) as correct_answers,
+                   collect(DISTINCT substring(a.completion_time, 0, 10)) as study_dates
+        """)
     
-    return jsonify({
+    student = _props(user_records[0]["u"])
+    answers_list = [record['answer_detail'] for record in answers_future.result()]
+    
+    progress_list = []
+    for record in progress_future.result():
+        progress_item = {
+            'subject': {
+                'id': record['subject_id'],
+                'name': record['subject_name']
+            },
+            'typebooks': record['typebooks'],
+            'chapters': record['chapters'],
+            'latest_activity': record['latest_activity'],
+            'first_activity': record['first_activity']
+        }
+        progress_list.append(progress_item)
+    
+    mistakes_list = [record['mistake'] for record in mistakes_future.result()]
+    
+    answer_stats = stats_future.result()[0]
+    study_dates = sorted(answer_stats['study_dates'], reverse=True)
+    
+    return _json_response({
         'student': student,
         'detailed_answers': answers_list,
         'learning_progress': progress_list,
         'recent_mistakes': mistakes_list,
         'study_dates': study_dates,
         'summary_counts': {
-            'total_answers': len(answers_list),
-            'correct_answers': len([a for a in answers_list if a.get('is_correct', False)]),
+            'total_answers': answer_stats['total_answers'],
+            'correct_answers': answer_stats['correct_answers'],
             'subjects_studied': len(progress_list),
             'recent_mistakes': len(mistakes_list)
         },
@@ -1433,149 +1823,270 @@ def get_student_detailed_info(user_id):
         'success': True
     })
 
-@app.route('/api/v1/students/detailed', methods=['GET'])
-@handle_errors
-def get_multiple_students_detailed():
-    """Get detailed information for multiple students"""
-    # Get query parameters
-    user_ids = request.args.get('user_ids', '').split(',') if request.args.get('user_ids') else []
-    subject_id = request.args.get('subject_id')
-    chapter_id = request.args.get('chapter_id')
-    lesson_id = request.args.get('lesson_id')
-    limit = int(request.args.get('limit', 20))
+@lru_cache(maxsize=16)
+def _build_detailed_query(has_users, has_subject, has_chapter, has_lesson):
+    """Cypher texts for the detailed-students endpoint, built once per filter shape.
     
-    with neo4j_api.driver.session() as session:
-        # Build dynamic query based on parameters
+    Identical text per shape also keeps the server-side plan cache warm.
+    """
+    # Anchor on the most selective filter; the planner picks the id index when the constraint exists
+    if has_lesson:
         base_query = """
-        MATCH (u:User)-[:ANSWERED]->(a:Answer)-[:ANSWERS_QUESTION]->(q:Question)
-        MATCH (q)-[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
+        MATCH (l:Lesson)<-[:BELONGS_TO_LESSON]-(q:Question)<-[:ANSWERS_QUESTION]-(a:Answer)<-[:ANSWERED]-(u:User)
+        WHERE l.id = $lesson_id
+        MATCH (l)-[:BELONGS_TO_CHAPTER]->(c:Chapter)-[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)-[:BELONGS_TO_SUBJECT]->(s:Subject)
+        """
+    elif has_chapter:
+        base_query = """
+        MATCH (c:Chapter)<-[:BELONGS_TO_CHAPTER]-(l:Lesson)<-[:BELONGS_TO_LESSON]-(q:Question)<-[:ANSWERS_QUESTION]-(a:Answer)<-[:ANSWERED]-(u:User)
+        WHERE c.id = $chapter_id
         MATCH (c)-[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)-[:BELONGS_TO_SUBJECT]->(s:Subject)
         """
-        
-        conditions = []
-        params = {'limit': limit}
-        
-        if user_ids and user_ids != ['']:
-            conditions.append("u.id IN $user_ids")
-            params['user_ids'] = user_ids
-        
-        if subject_id:
-            conditions.append("s.id = $subject_id")
-            params['subject_id'] = subject_id
-        
-        if chapter_id:
-            conditions.append("c.id = $chapter_id")
-            params['chapter_id'] = chapter_id
-        
-        if lesson_id:
-            conditions.append("l.id = $lesson_id")
-            params['lesson_id'] = lesson_id
-        
-        if conditions:
-            base_query += " WHERE " + " AND ".join(conditions)
-        
-        # Get detailed student information - FIX: avoid nested collections
-        detailed_query = base_query + """
-        WITH u, collect({
-            answer_id: a.id,
-            student_answer: a.student_answer,
-            is_correct: a.is_correct,
-            start_time: a.start_time,
-            completion_time: a.completion_time,
-            duration_seconds: a.duration_seconds,
-            question: {
-                id: q.id,
-                title: q.title,
-                content: q.content,
-                correct_answer: q.correct_answer,
-                difficulty: q.difficulty,
-                page: q.page
-            },
-            hierarchy: {
+    elif has_subject:
+        base_query = """
+        MATCH (s:Subject)<-[:BELONGS_TO_SUBJECT]-(t:TypeBook)<-[:BELONGS_TO_TYPE_BOOK]-(c:Chapter)<-[:BELONGS_TO_CHAPTER]-(l:Lesson)
+        WHERE s.id = $subject_id
+        MATCH (l)<-[:BELONGS_TO_LESSON]-(q:Question)<-[:ANSWERS_QUESTION]-(a:Answer)<-[:ANSWERED]-(u:User)
+        """
+    elif has_users:
+        base_query = """
+        MATCH (u:User)
+        WHERE u.id IN $user_ids AND EXISTS { (u)-[:ANSWERED]->(:Answer) }
+        """
+    else:
+        base_query = """
+        MATCH (u:User)
+        WHERE EXISTS { (u)-[:ANSWERED]->(:Answer) }
+        """
+    
+    # Filters other than the anchor are applied after the traversal
+    conditions = []
+    if has_users and (has_lesson or has_chapter or has_subject):
+        conditions.append("u.id IN $user_ids")
+    if has_subject and (has_lesson or has_chapter):
+        conditions.append("s.id = $subject_id")
+    if has_chapter and has_lesson:
+        conditions.append("c.id = $chapter_id")
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    
+    # Pick the page of students first; the per-student traversal below
+    # then only runs for at most $limit users
+    users_stage = base_query + where_clause + """
+    WITH DISTINCT u
+    ORDER BY u.name
+    LIMIT $limit
+    """
+    
+    # Hierarchy filters are re-applied inside the per-student subquery
+    scope_conditions = []
+    if has_subject:
+        scope_conditions.append("s.id = $subject_id")
+    if has_chapter:
+        scope_conditions.append("c.id = $chapter_id")
+    if has_lesson:
+        scope_conditions.append("l.id = $lesson_id")
+    scope_match = """
+        MATCH (u)-[:ANSWERED]->(a:Answer)-[:ANSWERS_QUESTION]->(q:Question)
+              -[:BELONGS_TO_LESSON]->(l:Lesson)-[:BELONGS_TO_CHAPTER]->(c:Chapter)
+              -[:BELONGS_TO_TYPE_BOOK]->(t:TypeBook)-[:BELONGS_TO_SUBJECT]->(s:Subject)
+    """
+    if scope_conditions:
+        scope_match += "    WHERE " + " AND ".join(scope_conditions)
+    
+    answer_map = """{
+                answer_id: a.id,
+                student_answer: a.student_answer,
+                is_correct: a.is_correct,
+                start_time: a.start_time,
+                completion_time: a.completion_time,
+                duration_seconds: a.duration_seconds,
+                question: q{.id, .title, .content, .correct_answer, .difficulty, .page},
+                lesson_id: l.id
+            }"""
+    # Lesson/chapter/typebook/subject names are sent once per lesson, answers refer to them by lesson_id
+    hierarchy_map = """{
+                lesson_id: l.id,
                 subject_name: s.name,
                 typebook_name: t.name,
                 chapter_name: c.name,
                 lesson_name: l.name
-            }
-        }) as answers
-        
-        RETURN {
-            student: {
-                id: u.id,
-                name: u.name,
-                email: u.email,
-                age: u.age,
-                createdAt: u.createdAt
-            },
-            answers: answers
-        } as student_data
+            }"""
+    
+    return {
+        # Count-only fast path: no per-student traversal at all
+        'count': base_query + where_clause + " RETURN count(DISTINCT u) AS total",
+        
+        # Summary fast path: flat per-student counters, no grouping or answer payloads
+        'summary': users_stage + """
+        CALL {
+            WITH u""" + scope_match + """
+            RETURN count(a) AS total,
+                   sum(CASE WHEN a.is_correct THEN 1 ELSE 0 END) AS correct,
+                   sum(a.duration_seconds) AS duration,
+                   count(DISTINCT s.name) AS subjects_count
+        }
+        RETURN u{.id, .name} AS student, total, correct, duration, subjects_count
         ORDER BY u.name
-        LIMIT $limit
+        """,
+        
+        # Pass A: per-student aggregates computed in Cypher, grouped by difficulty first
+        'students': users_stage + """
+        CALL {
+            WITH u""" + scope_match + """
+            WITH q.difficulty AS difficulty,
+                 count(a) AS d_total,
+                 sum(CASE WHEN a.is_correct THEN 1 ELSE 0 END) AS d_correct,
+                 sum(a.duration_seconds) AS d_duration,
+                 collect(DISTINCT s.name) AS d_subjects
+            RETURN sum(d_total) AS total,
+                   sum(d_correct) AS correct,
+                   sum(d_duration) AS duration,
+                   collect({difficulty: difficulty, total: d_total, correct: d_correct}) AS by_difficulty,
+                   reduce(acc = [], names IN collect(d_subjects) | acc + [n IN names WHERE NOT n IN acc]) AS subjects
+        }
+        CALL {
+            WITH u""" + scope_match + """
+            WITH a, q, t, s, c, l
+            ORDER BY a.completion_time DESC
+            LIMIT 5
+            RETURN collect(""" + answer_map + """) AS recent_answers,
+                   collect(DISTINCT """ + hierarchy_map + """) AS hierarchies
+        }
+        RETURN u{.id, .name, .email, .age, .createdAt} AS student,
+               total, correct, duration, by_difficulty, subjects, recent_answers, hierarchies
+        ORDER BY u.name
+        """,
+        
+        # Pass B: answer payloads for an already selected page of students
+        'answers': """
+        MATCH (u:User)
+        WHERE u.id IN $student_ids
+        CALL {
+            WITH u""" + scope_match + """
+            RETURN collect(""" + answer_map + """) AS answers,
+                   collect(DISTINCT """ + hierarchy_map + """) AS hierarchies
+        }
+        RETURN u.id AS user_id, answers, hierarchies
         """
+    }
+
+def _student_metrics(total_count, correct_count, duration, subjects_count):
+    """Per-student metrics dict shared by the full and summary modes (pure, no I/O)"""
+    return {
+        'total_answers': total_count,
+        'correct_answers': correct_count,
+        'accuracy_rate': round(correct_count / total_count * 100, 2) if total_count > 0 else 0,
+        'avg_duration': round((duration or 0) / total_count, 0) if total_count > 0 else 0,
+        'subjects_count': subjects_count
+    }
+
+def _summarize_student(record):
+    """Shape one summary-mode row: the student and its metrics only"""
+    return {
+        'student': record['student'],
+        'metrics': _student_metrics(record['total'], record['correct'],
+                                    record['duration'], record['subjects_count'])
+    }
+
+def _aggregate_student(record):
+    """Shape one per-student aggregate row into the response dict (pure, no I/O)"""
+    subjects = record['subjects']
+    
+    return {
+        'student': record['student'],
+        'recent_answers': record['recent_answers'],
+        'hierarchies': {h['lesson_id']: h for h in record['hierarchies']},
+        'subjects_studied': subjects,
+        'difficulty_performance': {
+            d['difficulty']: {'total': d['total'], 'correct': d['correct']}
+            for d in record['by_difficulty']
+        },
+        'metrics': _student_metrics(record['total'], record['correct'],
+                                    record['duration'], len(subjects))
+    }
+
+@app.route('/api/v1/students/detailed', methods=['GET'])
+@gzip_response
+@handle_errors
+def get_multiple_students_detailed():
+    """Get detailed information for multiple students"""
+    # Get query parameters
+    user_ids = [x for x in request.args.get('user_ids', '').split(',') if x]
+    subject_id = request.args.get('subject_id')
+    chapter_id = request.args.get('chapter_id')
+    lesson_id = request.args.get('lesson_id')
+    limit = int(request.args.get('limit', 20))
+    include_answers = request.args.get('include_answers', 'false').lower() == 'true'
+    mode = request.args.get('mode')
+    
+    has_users = bool(user_ids)
+    queries = _build_detailed_query(has_users, bool(subject_id), bool(chapter_id), bool(lesson_id))
+    
+    params = {'limit': limit}
+    if has_users:
+        params['user_ids'] = user_ids
+    if subject_id:
+        params['subject_id'] = subject_id
+    if chapter_id:
+        params['chapter_id'] = chapter_id
+    if lesson_id:
+        params['lesson_id'] = lesson_id
+    
+    applied_filters = {
+        'user_ids': user_ids or None,
+        'subject_id': subject_id,
+        'chapter_id': chapter_id,
+        'lesson_id': lesson_id,
+        'limit': limit,
+        'include_answers': include_answers
+    }
+    
+    if mode == 'count':
+        total_students = query_read(queries['count'], params)[0]['total']
+        return _json_response({
+            'filter_info': {'applied_filters': applied_filters, 'total_students': total_students},
+            'success': True
+        })
+    
+    if mode == 'summary':
+        students = [_summarize_student(record) for record in query_read(queries['summary'], params)]
+        return _json_response({
+            'students': students,
+            'filter_info': {'applied_filters': applied_filters, 'total_students': len(students)},
+            'success': True
+        })
+    
+    students_data = [_aggregate_student(record) for record in query_read(queries['students'], params)]
+    
+    # Pass B: answer payloads only when the caller asks for them
+    if include_answers and students_data:
+        answers_params = dict(params, student_ids=[sd['student']['id'] for sd in students_data])
+        answers_by_user = {
+            record['user_id']: record
+            for record in query_read(queries['answers'], answers_params)
+        }
         
-        result = session.run(detailed_query, params)
-        students_data = []
-        
-        for record in result:
-            student_info = record['student_data']
-            
-            # Calculate additional metrics for each student
-            answers = student_info['answers']
-            correct_count = len([a for a in answers if a['is_correct']])
-            total_count = len(answers)
-            
-            # Group answers by subject
-            subjects_map = {}
-            for answer in answers:
-                subject_name = answer['hierarchy']['subject_name']
-                if subject_name not in subjects_map:
-                    subjects_map[subject_name] = []
-                subjects_map[subject_name].append(answer)
+        for student_detailed in students_data:
+            record = answers_by_user.get(student_detailed['student']['id'])
+            answers = record['answers'] if record else []
+            hierarchies = student_detailed['hierarchies']
+            if record:
+                hierarchies.update((h['lesson_id'], h) for h in record['hierarchies'])
             
-            # Get recent activity
-            recent_answers = sorted(answers, key=lambda x: x['completion_time'], reverse=True)[:5]
-            
-            # Get performance by difficulty
-            difficulty_performance = {}
+            answers_by_subject = {}
             for answer in answers:
-                difficulty = answer['question']['difficulty']
-                if difficulty not in difficulty_performance:
-                    difficulty_performance[difficulty] = {'total': 0, 'correct': 0}
-                difficulty_performance[difficulty]['total'] += 1
-                if answer['is_correct']:
-                    difficulty_performance[difficulty]['correct'] += 1
-            
-            student_detailed = {
-                'student': student_info['student'],
-                'all_answers': answers,
-                'recent_answers': recent_answers,
-                'subjects_studied': list(subjects_map.keys()),
-                'answers_by_subject': subjects_map,
-                'difficulty_performance': difficulty_performance,
-                'metrics': {
-                    'total_answers': total_count,
-                    'correct_answers': correct_count,
-                    'accuracy_rate': round(correct_count / total_count * 100, 2) if total_count > 0 else 0,
-                    'avg_duration': round(sum(a['duration_seconds'] for a in answers) / len(answers), 0) if answers else 0,
-                    'subjects_count': len(subjects_map)
-                }
-            }
+                answers_by_subject.setdefault(hierarchies[answer['lesson_id']]['subject_name'], []).append(answer)
             
-            students_data.append(student_detailed)
-        
-        # Get filter information for response
-        filter_info = {
-            'applied_filters': {
-                'user_ids': user_ids if user_ids != [''] else None,
-                'subject_id': subject_id,
-                'chapter_id': chapter_id,
-                'lesson_id': lesson_id,
-                'limit': limit
-            },
-            'total_students': len(students_data)
-        }
+            student_detailed['all_answers'] = answers
+            student_detailed['answers_by_subject'] = answers_by_subject
     
-    return jsonify({
+    # Get filter information for response
+    filter_info = {
+        'applied_filters': applied_filters,
+        'total_students': len(students_data)
+    }
+    
+    return _json_response({
         'students': students_data,
         'filter_info': filter_info,
         'success': True
@@ -1602,7 +2113,7 @@ def create_simple_test():
         if not all(field in q for field in required_q_fields):
             return jsonify({'error': f'Question {i}: Missing {required_q_fields}', 'success': False}), 400
     
-    with neo4j_api.driver.session() as session:
+    with neo4j_api.write_session() as session:
         with session.begin_transaction() as tx:
             try:
                 # 1. Kiểm tra user có tồn tại
@@ -1611,7 +2122,7 @@ def create_simple_test():
                 if not user_record:
                     return jsonify({'error': 'User not found', 'success': False}), 404
                 
-                user_info = dict(user_record["u"].items())
+                user_info = _props(user_record["u"])
                 
                 # 2. Tạo Test
                 test_id = str(uuid.uuid4())
@@ -1793,14 +2304,14 @@ def create_simple_test():
 @handle_errors
 def get_user_minimal_test_history(user_id):
     """Lấy lịch sử test với cấu trúc tối giản - không có chapter/lessons/page"""
-    with neo4j_api.driver.session() as session:
+    with neo4j_api.read_session() as session:
         # Kiểm tra user có tồn tại
         user_check = session.run("MATCH (u:User {id: $user_id}) RETURN u", user_id=user_id)
         user_record = user_check.single()
         if not user_record:
             return jsonify({'error': 'User not found', 'success': False}), 404
         
-        user_info = dict(user_record["u"].items())
+        user_info = _props(user_record["u"])
         
         # Lấy tất cả test với cấu trúc minimal
         tests_result = session.run("""
@@ -1812,7 +2323,7 @@ def get_user_minimal_test_history(user_id):
         test_history = []
         
         for test_record in tests_result:
-            test = dict(test_record["t"].items())
+            test = _props(test_record["t"])
             
             # Lấy questions và answers với cấu trúc minimal
             qa_result = session.run("""
@@ -1826,8 +2337,8 @@ def get_user_minimal_test_history(user_id):
             total_questions = 0
             
             for qa_record in qa_result:
-                question = dict(qa_record["q"].items())
-                answer = dict(qa_record["a"].items())
+                question = _props(qa_record["q"])
+                answer = _props(qa_record["a"])
                 
                 qa_item = {
                     'question': {
@@ -1888,7 +2399,7 @@ def get_user_minimal_test_history(user_id):
 @handle_errors
 def get_simple_test_details(test_id):
     """Lấy chi tiết đơn giản của một bài test cụ thể - không có chapter/lessons"""
-    with neo4j_api.driver.session() as session:
+    with neo4j_api.read_session() as session:
         # Lấy thông tin test và user
         test_result = session.run("""
             MATCH (u:User)-[:TOOK]->(t:Test {id: $test_id})
@@ -1899,8 +2410,8 @@ def get_simple_test_details(test_id):
         if not test_record:
             return jsonify({'error': 'Test not found', 'success': False}), 404
         
-        test = dict(test_record["t"].items())
-        user = dict(test_record["u"].items())
+        test = _props(test_record["t"])
+        user = _props(test_record["u"])
         
         # Lấy tất cả câu trả lời với cấu trúc đơn giản
         answers_result = session.run("""
@@ -1911,8 +2422,8 @@ def get_simple_test_details(test_id):
         
         detailed_answers = []
         for record in answers_result:
-            answer = dict(record["ta"].items())
-            question = dict(record["q"].items())
+            answer = _props(record["ta"])
+            question = _props(record["q"])
             
             answer_detail = {
                 'question': {
@@ -1986,102 +2497,130 @@ def get_simple_test_details(test_id):
 
 # ==================== API DOCUMENTATION ====================
 
-@app.route('/', methods=['GET'])
-def api_docs():
-    """API documentation with correct structure"""
-    docs = {
-        'name': 'Education API - Correct Neo4j Structure',
-        'version': 'v1',
-        'hierarchy': 'Subject → TypeBook → Chapter → Lesson → Question',
-        'relationships': {
-            'User -[:ANSWERED]-> Answer': 'User answers questions',
-            'Answer -[:ANSWERS_QUESTION]-> Question': 'Answer links to question',
-            'Question -[:BELONGS_TO_LESSON]-> Lesson': 'Question belongs to lesson',
-            'Lesson -[:BELONGS_TO_CHAPTER]-> Chapter': 'Lesson belongs to chapter',
-            'Chapter -[:BELONGS_TO_TYPE_BOOK]-> TypeBook': 'Chapter belongs to typebook',
-            'TypeBook -[:BELONGS_TO_SUBJECT]-> Subject': 'TypeBook belongs to subject'
+# Documentation payload is constant, so it is serialized (and hashed) once at import
+API_DOCS = {
+    'name': 'Education API - Correct Neo4j Structure',
+    'version': 'v1',
+    'hierarchy': 'Subject → TypeBook → Chapter → Lesson → Question',
+    'relationships': {
+        'User -[:ANSWERED]-> Answer': 'User answers questions',
+        'Answer -[:ANSWERS_QUESTION]-> Question': 'Answer links to question',
+        'Question -[:BELONGS_TO_LESSON]-> Lesson': 'Question belongs to lesson',
+        'Lesson -[:BELONGS_TO_CHAPTER]-> Chapter': 'Lesson belongs to chapter',
+        'Chapter -[:BELONGS_TO_TYPE_BOOK]-> TypeBook': 'Chapter belongs to typebook',
+        'TypeBook -[:BELONGS_TO_SUBJECT]-> Subject': 'TypeBook belongs to subject'
+    },
+    'endpoints': {
+        'Tree Structure': {
+            'GET /api/v1/tree': 'Get complete tree with all IDs (?include_users=true&include_questions=true)',
+            'GET /api/v1/tree/ids-only': 'Get minimal tree structure (only IDs)',
+            'GET /api/v1/tree/flat': 'Get flattened structure for easy navigation'
         },
-        'endpoints': {
-            'Tree Structure': {
-                'GET /api/v1/tree': 'Get complete tree with all IDs (?include_users=true&include_questions=true)',
-                'GET /api/v1/tree/ids-only': 'Get minimal tree structure (only IDs)',
-                'GET /api/v1/tree/flat': 'Get flattened structure for easy navigation'
-            },
-            'Hierarchy': {
-                'GET /api/v1/subjects': 'Get all subjects',
-                'GET /api/v1/typebooks': 'Get typebooks (?subject_id=xxx)',
-                'GET /api/v1/chapters': 'Get chapters (?typebook_id=xxx)',
-                'GET /api/v1/lessons': 'Get lessons (?chapter_id=xxx)'
-            },
-            'Users': {
-                'GET /api/v1/users': 'Get all users',
-                'POST /api/v1/users': 'Create user',
-                'POST /api/v1/users/bulk': 'Import users'
-            },
-            'Questions': {
-                'GET /api/v1/questions': 'Get questions (?lesson_id=xxx or ?chapter_id=xxx)',
-                'POST /api/v1/questions': 'Create question (requires lesson_id)',
-                'POST /api/v1/questions/bulk': 'Import questions'
-            },
-            'Answers': {
-                'GET /api/v1/answers': 'Get answers (?user_id=xxx or ?question_id=xxx)',
-                'POST /api/v1/answers': 'Submit answer',
-                'POST /api/v1/answers/bulk': 'Import answers'
-            },
-            'Analytics': {
-                'GET /api/v1/analytics/hierarchy': 'Analytics by hierarchy',
-                'GET /api/v1/analytics/user/{user_id}': 'User performance analytics'
-            },
-            'Export': {
-                'GET /api/v1/export': 'Export all data with hierarchy'
+        'Hierarchy': {
+            'GET /api/v1/subjects': 'Get all subjects',
+            'GET /api/v1/typebooks': 'Get typebooks (?subject_id=xxx)',
+            'GET /api/v1/chapters': 'Get chapters (?typebook_id=xxx)',
+            'GET /api/v1/lessons': 'Get lessons (?chapter_id=xxx)'
+        },
+        'Users': {
+            'GET /api/v1/users': 'Get all users',
+            'POST /api/v1/users': 'Create user',
+            'POST /api/v1/users/bulk': 'Import users'
+        },
+        'Questions': {
+            'GET /api/v1/questions': 'Get questions (?lesson_id=xxx or ?chapter_id=xxx)',
+            'POST /api/v1/questions': 'Create question (requires lesson_id)',
+            'POST /api/v1/questions/bulk': 'Import questions'
+        },
+        'Answers': {
+            'GET /api/v1/answers': 'Get answers (?user_id=xxx or ?question_id=xxx)',
+            'POST /api/v1/answers': 'Submit answer',
+            'POST /api/v1/answers/bulk': 'Import answers'
+        },
+        'Students': {
+            'GET /api/v1/students/{user_id}/detailed': 'Detailed answers, progress and mistakes of one student',
+            'GET /api/v1/students/detailed': 'Per-student details (?user_ids=a,b&subject_id=&chapter_id=&lesson_id=&limit=20&include_answers=true&mode=summary|count)'
+        },
+        'Analytics': {
+            'GET /api/v1/analytics/hierarchy': 'Analytics by hierarchy',
+            'GET /api/v1/analytics/user/{user_id}': 'User performance analytics'
+        },
+        'Export': {
+            'GET /api/v1/export': 'Export all data with hierarchy'
+        }
+    },
+    'examples': {
+        'create_question_correct': {
+            'POST /api/v1/questions': {
+                'lesson_id': 'lesson-uuid-from-existing-lesson',
+                'title': 'bài 1 trang 7 sách giáo khoa toán lớp 1',
+                'content': 'Dùng các từ: trên, dưới, trái, phải để nói về bức tranh?',
+                'correct_answer': 'Bạn Lan đang ngồi ở giữa bàn học...',
+                'difficulty': 'dễ',
+                'page': 7,
+                'image_question': 'images/bai1-trang7-sgk.png'
             }
         },
-        'examples': {
-            'create_question_correct': {
-                'POST /api/v1/questions': {
-                    'lesson_id': 'lesson-uuid-from-existing-lesson',
-                    'title': 'bài 1 trang 7 sách giáo khoa toán lớp 1',
-                    'content': 'Dùng các từ: trên, dưới, trái, phải để nói về bức tranh?',
-                    'correct_answer': 'Bạn Lan đang ngồi ở giữa bàn học...',
-                    'difficulty': 'dễ',
-                    'page': 7,
-                    'image_question': 'images/bai1-trang7-sgk.png'
-                }
-            },
-            'submit_answer_correct': {
-                'POST /api/v1/answers': {
-                    'user_id': 'user-uuid',
-                    'question_id': 'question-uuid',
-                    'student_answer': 'Em thấy có 3 quả táo',
-                    'is_correct': True,
-                    'duration_seconds': 120
-                }
-            },
-            'import_questions_bulk': {
-                'POST /api/v1/questions/bulk': {
-                    'questions': [
-                        {
-                            'lesson_id': 'lesson-uuid',
-                            'title': 'Câu hỏi 1',
-                            'content': 'Nội dung câu hỏi 1',
-                            'correct_answer': 'Đáp án đúng',
-                            'difficulty': 'dễ',
-                            'page': 7
-                        }
-                    ]
-                }
+        'submit_answer_correct': {
+            'POST /api/v1/answers': {
+                'user_id': 'user-uuid',
+                'question_id': 'question-uuid',
+                'student_answer': 'Em thấy có 3 quả táo',
+                'is_correct': True,
+                'duration_seconds': 120
             }
         },
-        'workflow': {
-            '1': 'Tạo/Lấy Subject → TypeBook → Chapter → Lesson (hierarchy có sẵn)',
-            '2': 'Tạo Question với lesson_id → tự động link đến Lesson',
-            '3': 'User trả lời → tạo Answer với user_id + question_id → tự động link relationships',
-            '4': 'Query có thể trace được full hierarchy: Subject → TypeBook → Chapter → Lesson → Question → Answer → User'
+        'students_detailed_summary': {
+            'GET /api/v1/students/detailed?mode=summary': {
+                'students': [
+                    {
+                        'student': {'id': 'user-uuid', 'name': 'Nguyễn Văn A'},
+                        'metrics': {
+                            'total_answers': 12,
+                            'correct_answers': 9,
+                            'accuracy_rate': 75.0,
+                            'avg_duration': 95.0,
+                            'subjects_count': 2
+                        }
+                    }
+                ],
+                'filter_info': {'applied_filters': {'limit': 20}, 'total_students': 1},
+                'success': True
+            }
         },
-        'note': 'Mọi Question phải có lesson_id. Mọi Answer phải có user_id + question_id. Relationships sẽ tự động được tạo.'
-    }
-    
-    return jsonify(docs)
+        'import_questions_bulk': {
+            'POST /api/v1/questions/bulk': {
+                'questions': [
+                    {
+                        'lesson_id': 'lesson-uuid',
+                        'title': 'Câu hỏi 1',
+                        'content': 'Nội dung câu hỏi 1',
+                        'correct_answer': 'Đáp án đúng',
+                        'difficulty': 'dễ',
+                        'page': 7
+                    }
+                ]
+            }
+        }
+    },
+    'workflow': {
+        '1': 'Tạo/Lấy Subject → TypeBook → Chapter → Lesson (hierarchy có sẵn)',
+        '2': 'Tạo Question với lesson_id → tự động link đến Lesson',
+        '3': 'User trả lời → tạo Answer với user_id + question_id → tự động link relationships',
+        '4': 'Query có thể trace được full hierarchy: Subject → TypeBook → Chapter → Lesson → Question → Answer → User'
+    },
+    'note': 'Mọi Question phải có lesson_id. Mọi Answer phải có user_id + question_id. Relationships sẽ tự động được tạo.'
+}
+
+_API_DOCS_JSON = _dumps(API_DOCS)
+_API_DOCS_ETAG = hashlib.sha1(_API_DOCS_JSON).hexdigest()
+
+@app.route('/', methods=['GET'])
+def api_docs():
+    """API documentation with correct structure"""
+    response = Response(_API_DOCS_JSON, mimetype='application/json')
+    response.set_etag(_API_DOCS_ETAG)
+    return response.make_conditional(request)
 
 # ==================== STARTUP ====================
 
@@ -2095,7 +2634,8 @@ if __name__ == '__main__':
         app.run(
             host='0.0.0.0',
             port=int(os.getenv('PORT', 5000)),
-            debug=os.getenv('DEBUG', 'False').lower() == 'true'
+            debug=os.getenv('DEBUG', 'False').lower() == 'true',
+            threaded=True
         )
     except KeyboardInterrupt:
         logger.info("🛑 API shutdown")
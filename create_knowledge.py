@@ -6,7 +6,6 @@ Import trực tiếp vào Neo4j database
 """
 
 import os
-import uuid
 from datetime import datetime
 from neo4j import GraphDatabase
 import logging
@@ -23,6 +22,9 @@ NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
 
+# Số Knowledge mỗi transaction khi import bulk
+BATCH_SIZE = 1000
+
 class KnowledgeImporter:
     def __init__(self):
         self.driver = None
@@ -49,10 +51,6 @@ class KnowledgeImporter:
             self.driver.close()
             logger.info("🔒 Neo4j connection closed")
     
-    def generate_uuid(self):
-        """Generate unique UUID"""
-        return str(uuid.uuid4())
-    
     def get_knowledge_list(self):
         """Danh sách tất cả kiến thức Toán Lớp 1"""
         return [
@@ -101,101 +99,78 @@ class KnowledgeImporter:
             "Đồng hồ - thời gian"
         ]
     
-    def check_existing_knowledge(self, session):
-        """Kiểm tra Knowledge nodes đã tồn tại"""
-        result = session.run("MATCH (k:Knowledge) RETURN count(k) as count")
-        count = result.single()["count"]
-        logger.info(f"📊 Found {count} existing Knowledge nodes")
-        return count
-    
-    def clear_existing_knowledge(self, session):
-        """Xóa tất cả Knowledge nodes cũ (nếu cần)"""
-        result = session.run("MATCH (k:Knowledge) DELETE k RETURN count(k) as deleted")
-        deleted = result.consume().counters.nodes_deleted
-        logger.info(f"🗑️ Deleted {deleted} existing Knowledge nodes")
-        return deleted
+    def ensure_constraint(self, session):
+        """Tạo unique constraint cho Knowledge (name, subject, grade) nếu chưa có"""
+        try:
+            session.run("""
+                CREATE CONSTRAINT knowledge_name_unique IF NOT EXISTS
+                FOR (k:Knowledge) REQUIRE (k.name, k.subject, k.grade) IS UNIQUE
+            """).consume()
+        except Exception as e:
+            # e.g. duplicates left by older imports; MERGE still works, just without the index
+            logger.warning(f"⚠️ Could not create Knowledge constraint: {e}")
     
-    def create_knowledge_node(self, session, knowledge_data):
-        """Tạo một Knowledge node"""
+    def create_knowledge_node(self, session, item, now):
+        """Tạo (hoặc cập nhật) một Knowledge node, trả về số node mới tạo"""
         query = """
-        CREATE (k:Knowledge {
-            id: $id,
-            name: $name,
-            description: $description,
-            order: $order,
-            subject: $subject,
-            grade: $grade,
-            createdAt: $createdAt,
-            updatedAt: $updatedAt
-        })
-        RETURN k
+        MERGE (k:Knowledge {name: $name, subject: 'Toán', grade: 'Lớp 1'})
+        ON CREATE SET k.id = randomUUID(),
+                      k.description = 'Kiến thức về: ' + $name,
+                      k.order = $order,
+                      k.createdAt = $now,
+                      k.updatedAt = $now
+        ON MATCH SET k.order = $order,
+                     k.updatedAt = $now
         """
         
-        result = session.run(query, knowledge_data)
-        return result.single()["k"]
+        result = session.run(query, name=item["name"], order=item["order"], now=now)
+        return result.consume().counters.nodes_created
     
-    def bulk_create_knowledge(self, session, knowledge_list):
-        """Tạo nhiều Knowledge nodes cùng lúc (optimized)"""
+    def bulk_create_knowledge(self, session, items, now):
+        """Tạo nhiều Knowledge nodes cùng lúc (optimized, chạy lại không bị trùng)"""
+        # id và description được sinh phía server, chỉ gửi name + order
         query = """
-        UNWIND $knowledge_list as knowledge
-        CREATE (k:Knowledge {
-            id: knowledge.id,
-            name: knowledge.name,
-            description: knowledge.description,
-            order: knowledge.order,
-            subject: knowledge.subject,
-            grade: knowledge.grade,
-            createdAt: knowledge.createdAt,
-            updatedAt: knowledge.updatedAt
-        })
-        RETURN count(k) as created_count
+        UNWIND $items AS it
+        MERGE (k:Knowledge {name: it.name, subject: 'Toán', grade: 'Lớp 1'})
+        ON CREATE SET k.id = randomUUID(),
+                      k.description = 'Kiến thức về: ' + it.name,
+                      k.order = it.order,
+                      k.createdAt = $now,
+                      k.updatedAt = $now
+        ON MATCH SET k.order = it.order,
+                     k.updatedAt = $now
         """
         
-        result = session.run(query, knowledge_list=knowledge_list)
-        return result.single()["created_count"]
+        def _write(tx, chunk):
+            return tx.run(query, items=chunk, now=now).consume().counters.nodes_created
+        
+        # Mỗi lô một transaction có retry, giữ bộ nhớ transaction trong giới hạn
+        created_count = 0
+        for start in range(0, len(items), BATCH_SIZE):
+            created_count += session.execute_write(_write, items[start:start + BATCH_SIZE])
+        return created_count
     
-    def import_knowledge_nodes(self, clear_existing=False, use_bulk=True):
+    def import_knowledge_nodes(self, use_bulk=True):
         """Import tất cả Knowledge nodes"""
         knowledge_names = self.get_knowledge_list()
         
         # Prepare data
-        knowledge_data = []
+        knowledge_data = [{"name": name, "order": i} for i, name in enumerate(knowledge_names, 1)]
         now = datetime.now().isoformat()
         
-        for i, name in enumerate(knowledge_names, 1):
-            data = {
-                "id": self.generate_uuid(),
-                "name": name,
-                "description": f"Kiến thức về: {name}",
-                "order": i,
-                "subject": "Toán",
-                "grade": "Lớp 1",
-                "createdAt": now,
-                "updatedAt": now
-            }
-            knowledge_data.append(data)
-        
         # Import to Neo4j
         with self.driver.session() as session:
-            # Check existing
-            existing_count = self.check_existing_knowledge(session)
-            
-            # Clear if requested
-            if clear_existing and existing_count > 0:
-                user_input = input(f"❓ Delete {existing_count} existing Knowledge nodes? (y/N): ")
-                if user_input.lower() == 'y':
-                    self.clear_existing_knowledge(session)
-                else:
-                    logger.info("⏭️ Skipping deletion, adding new nodes...")
+            # MERGE on the constrained key makes reruns idempotent
+            self.ensure_constraint(session)
             
             # Create nodes
-            logger.info(f"📝 Creating {len(knowledge_data)} Knowledge nodes...")
+            logger.info(f"📝 Merging {len(knowledge_data)} Knowledge nodes...")
             
             if use_bulk:
                 # Bulk import (faster)
                 try:
-                    created_count = self.bulk_create_knowledge(session, knowledge_data)
-                    logger.info(f"✅ Bulk created {created_count} Knowledge nodes")
+                    created_count = self.bulk_create_knowledge(session, knowledge_data, now)
+                    logger.info(f"✅ Bulk created {created_count} new Knowledge nodes")
                 except Exception as e:
                     logger.error(f"❌ Bulk import failed: {e}")
                     logger.info("🔄 Falling back to individual creation...")
@@ -208,9 +183,9 @@ class KnowledgeImporter:
                 
                 for i, data in enumerate(knowledge_data, 1):
                     try:
-                        node = self.create_knowledge_node(session, data)
+                        created = self.create_knowledge_node(session, data, now)
                         logger.info(f"✅ {i:2d}. {data['name']}")
-                        created_count += 1
+                        created_count += created
                     except Exception as e:
                         error_msg = f"❌ {i:2d}. {data['name']} - {str(e)}"
                         logger.error(error_msg)
@@ -260,8 +235,7 @@ def main():
         
         # Import knowledge nodes
         created, total = importer.import_knowledge_nodes(
-            clear_existing=True,  # Set to False if you don't want to clear existing
-            use_bulk=True         # Use bulk import for better performance
+            use_bulk=True  # Use bulk import for better performance
         )
         
         logger.info("=" * 70)
@@ -232,7 +232,7 @@ class EducationSystem:
                         WHERE u.email IN $email_list 
                         RETURN u.email as email
                     """, email_list=email_list)
-                    existing_emails = [record['email'] for record in existing_emails_result]
+                    existing_emails = {record['email'] for record in existing_emails_result}
                     
                     # Check existing IDs
                     existing_ids_result = tx.run("""
@@ -240,7 +240,7 @@ class EducationSystem:
                         WHERE u.id IN $id_list 
                         RETURN u.id as id
                     """, id_list=id_list)
-                    existing_ids = [record['id'] for record in existing_ids_result]
+                    existing_ids = {record['id'] for record in existing_ids_result}
                     
                     # Filter out existing emails and IDs
                     new_users = []
@@ -1068,9 +1068,7 @@ class EducationSystem:
             # Get all knowledge linked to user
             result = session.run("""
                 MATCH (u:User {id: $user_id})-[r:LEARNED]->(k:Knowledge)
-                RETURN k, r, 
-                       substring(r.linkedAt, 0, 10) as linked_date,
-                       substring(r.linkedAt, 11, 8) as linked_time
+                RETURN k, r
                 ORDER BY r.linkedAt DESC
             """, user_id=user_id)
             
@@ -1082,8 +1080,8 @@ class EducationSystem:
                 knowledge_link = {
                     'knowledge': knowledge,
                     'relationship': relationship,
-                    'linked_date': record['linked_date'],
-                    'linked_time': record['linked_time']
+                    'linked_date': relationship.get('linkedAt', '')[:10] or None,
+                    'linked_time': relationship.get('linkedAt', '')[11:19] or None
                 }
                 user_knowledge.append(knowledge_link)
             